@@ -14,6 +14,12 @@ CLASSIFIERS = [
 
 PYTHON_REQUIRES = '>=3.7'
 
+# optional packages; pyNastran falls back to numpy without them
+#  - numba: compiled kernels for the ugrid/OpenFOAM converters
+EXTRAS_REQUIRE = {
+    'numba': ['numba'],
+}
+
 
 # features in packages used by pyNastran
 # numpy
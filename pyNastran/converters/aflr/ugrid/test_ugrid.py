@@ -1,5 +1,6 @@
 """Defines TestUGrid"""
 import os
+import tempfile
 import unittest
 import numpy as np
 from cpylog import get_logger
@@ -9,6 +10,8 @@ from pyNastran.bdf.bdf import read_bdf
 from pyNastran.converters.nastran.nastran_to_ugrid import nastran_to_ugrid
 from pyNastran.converters.nastran.nastran_to_ugrid3d import merge_ugrid3d_and_bdf_to_ugrid3d_filename
 from pyNastran.converters.aflr.ugrid.ugrid3d_to_nastran import ugrid3d_to_nastran
+from pyNastran.converters.aflr.ugrid.ugrid_reader import UGRID
+from pyNastran.converters.aflr.ugrid.ugrid3d_to_openfoam import write_foam
 from pyNastran.converters.aflr.ugrid.ugrid3d_to_tecplot import (
     ugrid_to_tecplot, ugrid3d_to_tecplot_filename, read_ugrid)
 from pyNastran.converters.format_converter import cmd_line_format_converter
@@ -100,6 +103,104 @@ class TestUgrid(unittest.TestCase):
         os.remove(tecplot_filename2)
         os.remove(tecplot_filename3)
 
+    def test_ugrid3d_skin_solids(self):
+        """the shared faces of neighboring solids aren't on the skin"""
+        log = get_logger(level='warning')
+        model = UGRID(log=log)
+        model.hexas = np.array([
+            [1, 2, 3, 4, 5, 6, 7, 8],
+            [5, 6, 7, 8, 9, 10, 11, 12],
+        ], dtype='int32')
+        model.penta6s = np.array([[9, 10, 11, 13, 14, 15]], dtype='int32')
+        tris, quads = model.skin_solids()
+        assert tris.tolist() == [[9, 10, 11], [13, 14, 15]], tris
+        assert quads.shape == (13, 4), quads.shape
+        assert [5, 6, 7, 8] not in quads.tolist(), quads
+
+    def test_ugrid3d_pid_index(self):
+        """editing the pids in place updates the pid index"""
+        log = get_logger(level='warning')
+        model = UGRID(log=log)
+        model.pids = np.array([3, 1, 3, 2], dtype='int32')
+        upids, counts, starts, isort = model._get_pid_index()
+        assert upids.tolist() == [1, 2, 3], upids
+        assert counts.tolist() == [1, 1, 2], counts
+        assert starts.tolist() == [0, 1, 2], starts
+        assert isort.tolist() == [1, 3, 0, 2], isort
+
+        model.pids[1] = 4
+        upids, counts, starts, isort = model._get_pid_index()
+        assert upids.tolist() == [2, 3, 4], upids
+        assert counts.tolist() == [1, 2, 1], counts
+
+    def test_ugrid3d_openfoam_faces(self):
+        """the shared face of two solids has an owner and a neighbour"""
+        log = get_logger(level='warning')
+        model = UGRID(log=log)
+        model.nodes = np.array([
+            [0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.],
+            [0., 0., 1.], [1., 0., 1.], [1., 1., 1.], [0., 1., 1.],
+            [0., 0., 2.], [1., 0., 2.], [1., 1., 2.], [0., 1., 2.],
+            [0., 0., 3.], [1., 0., 3.], [1., 1., 3.],
+        ])
+        model.hexas = np.array([
+            [1, 2, 3, 4, 5, 6, 7, 8],
+            [5, 6, 7, 8, 9, 10, 11, 12],
+        ], dtype='int32')
+        model.penta6s = np.array([[9, 10, 11, 13, 14, 15]], dtype='int32')
+
+        # the surface elements are the boundary patches
+        model.tris, model.quads = model.skin_solids()
+        nshells = len(model.tris) + len(model.quads)
+        model.pids = np.array([3, 1, 2] * 5, dtype='int32')[:nshells]
+
+        with tempfile.TemporaryDirectory() as dirname:
+            tag_filename = os.path.join(dirname, 'model.tags')
+            with open(tag_filename, 'w') as tag_file:
+                for pid in [1, 2, 3]:
+                    tag_file.write('%i patch%i 0 1 1 0 0 0 0 0 0 0\n' % (pid, pid))
+            write_foam(model, os.path.join(dirname, 'model.foam'), tag_filename)
+
+            lines = {}
+            for filename in ['faces', 'owner', 'neighbour', 'boundary']:
+                with open(os.path.join(dirname, filename), 'r') as foam_file:
+                    lines[filename] = foam_file.readlines()
+        assert '    class       faceList;\n' in lines['faces']
+        assert '    object      owner;\n' in lines['owner']
+
+        face_lines = lines['faces']
+        i = face_lines.index('16\n')
+        assert face_lines[i+1] == '(\n', face_lines
+        assert face_lines[-1] == ')\n', face_lines
+        faces = [[int(nid) for nid in line[2:-2].split()]
+                 for line in face_lines[i+2:-1]]
+        assert len(faces) == 16, len(faces)
+
+        i = lines['owner'].index('16\n')
+        owners = [int(line) for line in lines['owner'][i+2:-1]]
+        assert owners[0] == 0, owners
+        assert sorted(owners[1:]) == [0] * 5 + [1] * 5 + [2] * 5, owners
+        assert lines['neighbour'][-4:] == ['1\n', '(\n', '1\n', ')\n'], lines['neighbour']
+
+        # the internal face is first and points out of the owner
+        assert sorted(faces[0]) == [4, 5, 6, 7], faces
+        xyz = model.nodes[faces[0], :]
+        normal = np.cross(xyz[2] - xyz[0], xyz[3] - xyz[1])
+        assert normal[2] > 0., normal
+
+        # each patch is the slice of boundary faces with its pid
+        shells = [sorted(shell) for shell in model.tris.tolist() + model.quads.tolist()]
+        face_pids = [model.pids[shells.index(sorted(np.array(face) + 1))]
+                     for face in faces[1:]]
+        boundary_lines = lines['boundary']
+        assert '    class       polyBoundaryMesh;\n' in boundary_lines
+        for pid in [1, 2, 3]:
+            i = boundary_lines.index('    patch%i\n' % pid)
+            nfaces = int(boundary_lines[i+3].split()[1].rstrip(';'))
+            startface = int(boundary_lines[i+4].split()[1].rstrip(';'))
+            assert face_pids[startface-1:startface-1+nfaces] == [pid] * nfaces, face_pids
+            assert nfaces == (model.pids == pid).sum()
+
     def test_ugrid3d_convert(self):
         argv = ['format_converter', 'afrl', 'junk.b8.ugrid', 'stl', 'cart3d.stl']
         with self.assertRaises(NotImplementedError):
@@ -1,11 +1,64 @@
 import os
-from copy import deepcopy
-from collections import defaultdict
+from io import StringIO
 
-from numpy import zeros, unique, where, argsort, searchsorted, allclose, array
+import numpy as np
+from numpy import zeros, where, argsort, arange
 
 from pyNastran.converters.aflr.ugrid.ugrid_reader import read_ugrid
 from pyNastran.converters.aflr.surf.surf_reader import TagReader
+try:
+    from numba import njit, prange
+    IS_NUMBA = True
+except ImportError:  # pragma: no cover
+    IS_NUMBA = False
+
+# the local node ids of the faces of each solid; OpenFOAM requires that
+# the right-hand rule normal points out of the element (the owner)
+_TET_FACES = np.array([[2, 1, 0], [0, 1, 3], [3, 2, 0], [1, 2, 3]], dtype='intp')
+_HEXA_FACES = np.array([[3, 2, 1, 0], [2, 6, 5, 1], [6, 7, 4, 5],
+                        [7, 3, 0, 4], [7, 6, 2, 3], [0, 1, 5, 4]], dtype='intp')
+_PENTA5_TRI_FACES = np.array([[1, 2, 4], [0, 1, 4], [3, 0, 4], [4, 2, 3]], dtype='intp')
+_PENTA5_QUAD_FACES = np.array([[3, 2, 1, 0]], dtype='intp')
+_PENTA6_TRI_FACES = np.array([[2, 1, 0], [5, 3, 4]], dtype='intp')
+_PENTA6_QUAD_FACES = np.array([[2, 5, 4, 1], [5, 2, 0, 3], [0, 1, 4, 3]], dtype='intp')
+
+
+if IS_NUMBA:
+    @njit(cache=True)
+    def _compare_swap(face, i, j):  # pragma: no cover
+        """puts the smaller of face[i] and face[j] in face[i]"""
+        a = face[i]
+        b = face[j]
+        face[i] = min(a, b)
+        face[j] = max(a, b)
+
+    @njit(parallel=True, cache=True)
+    def _fill_faces_kernel(elements, face_templates, faces, faces_sort, face_eids,
+                           iface, eid):  # pragma: no cover
+        """numba kernel for ``_fill_faces``"""
+        nfaces_per_element, nnodes_per_face = face_templates.shape
+        for ielement in prange(elements.shape[0]):
+            jface = iface + ielement * nfaces_per_element
+            for i in range(nfaces_per_element):
+                face = faces[jface + i, :]
+                face_sort = faces_sort[jface + i, :]
+                for j in range(nnodes_per_face):
+                    face[j] = elements[ielement, face_templates[i, j]]
+                    face_sort[j] = face[j]
+                face_eids[jface + i] = eid + ielement
+
+                # sorting networks for the 3/4 node faces
+                if nnodes_per_face == 3:
+                    _compare_swap(face_sort, 0, 1)
+                    _compare_swap(face_sort, 1, 2)
+                    _compare_swap(face_sort, 0, 1)
+                else:
+                    _compare_swap(face_sort, 0, 1)
+                    _compare_swap(face_sort, 2, 3)
+                    _compare_swap(face_sort, 0, 2)
+                    _compare_swap(face_sort, 1, 3)
+                    _compare_swap(face_sort, 1, 2)
+
 
 def write_foam(ugrid, foam_filename, tag_filename):
     """writes an OpenFOAM file"""
@@ -15,8 +68,8 @@ def write_foam(ugrid, foam_filename, tag_filename):
     points_filename = os.path.join(dirname, 'points')
     boundary_filename = os.path.join(dirname, 'boundary')
     faces_filename = os.path.join(dirname, 'faces')
-    #neighbor_filename = os.path.join(dirname, 'neighbor')
-    #owner_filename = os.path.join(dirname, 'owner')
+    owner_filename = os.path.join(dirname, 'owner')
+    neighbour_filename = os.path.join(dirname, 'neighbour')
 
     # boundary
     # 1. get array of unique properties
@@ -43,49 +96,67 @@ def write_foam(ugrid, foam_filename, tag_filename):
     #mid = 1
     #points_filename = foam_filename  # remove...
     _write_points(ugrid, points_filename)
-    _write_boundary(ugrid, boundary_filename + '2', tag_filename)
-    _write_faces(ugrid, faces_filename + '2')
+    unused_faces, unused_owners, neighbours = _write_faces(
+        ugrid, faces_filename, owner_filename, neighbour_filename)
+    _write_boundary(ugrid, boundary_filename, tag_filename, len(neighbours))
+
+
+def _write_foam_header(foam_file, class_name, object_name):
+    """writes the FoamFile header of a constant/polyMesh file"""
+    foam_file.write(
+        '/*--------------------------------*- C++ -*----------------------------------*\\\n'
+        '| =========                 |                                                 |\n'
+        '| \\\\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox           |\n'
+        '|  \\\\    /   O peration     | Version:  1.7.1                                 |\n'
+        '|   \\\\  /    A nd           | Web:      www.OpenFOAM.com                      |\n'
+        '|    \\\\/     M anipulation  |                                                 |\n'
+        '\\*---------------------------------------------------------------------------*/\n'
+        'FoamFile\n'
+        '{\n'
+        '    version     2.0;\n'
+        '    format      ascii;\n'
+        '    class       %s;\n'
+        '    location    "constant/polyMesh";\n'
+        '    object      %s;\n'
+        '}\n'
+        '// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * /\n'
+        % (class_name, object_name)
+    )
+
 
 def _write_points(ugrid, points_filename):
     """writes an OpenFOAM points file"""
-    with open(points_filename, 'wb') as points_file:
+    with open(points_filename, 'w') as points_file:
         nnodes = ugrid.nodes.shape[0]
 
-        points_file.write(
-            '/*--------------------------------*- C++ -*----------------------------------*\\\n'
-            '| =========                 |                                                 |\n'
-            '| \\\\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox           |\n'
-            '|  \\\\    /   O peration     | Version:  1.7.1                                 |\n'
-            '|   \\\\  /    A nd           | Web:      www.OpenFOAM.com                      |\n'
-            '|    \\\\/     M anipulation  |                                                 |\n'
-            '\\*---------------------------------------------------------------------------*/\n'
-            'FoamFile\n'
-            '{\n'
-            '    version     2.0;\n'
-            '    format      ascii;\n'
-            '    class       vectorField;\n'
-            '    location    "constant/polyMesh";\n'
-            '    object      points;\n'
-            '}\n'
-            '// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * /\n'
-        )
-
-
+        _write_foam_header(points_file, 'vectorField', 'points')
         points_file.write('\n\n')
         points_file.write('%i\n' % (nnodes))
         points_file.write('(\n')
-        for node in enumerate(ugrid.nodes):
-            points_file.write(('    (%-12s %-12s %-12s)\n') % (node[0], node[1], node[2]))
+        # a single buffered block rather than a write per node
+        np.savetxt(points_file, ugrid.nodes, fmt='    (%-12s %-12s %-12s)')
         points_file.write(')\n')
 
-def _write_boundary(ugrid, boundary_filename, tag_filename):
-    """writes an OpenFOAM boundary file"""
-    with open(boundary_filename, 'wb') as boundary_file:
+def _write_boundary(ugrid, boundary_filename, tag_filename, ninternal_faces):
+    """
+    Writes an OpenFOAM boundary file
+
+    Parameters
+    ----------
+    ninternal_faces : int
+        the number of internal faces, which are written before the boundary
+        faces in the faces file
+    """
+    with open(boundary_filename, 'w') as boundary_file:
+        _write_foam_header(boundary_file, 'polyBoundaryMesh', 'boundary')
         boundary_file.write('\n\n')
-        #f.write('%i\n' % (nnodes))
-        boundary_file.write('(\n')
 
-        uboundaries = unique(ugrid.pids)
+        # _write_faces writes the boundary faces after the internal faces,
+        # stably sorted by the pid of their surface element, so each
+        # boundary's faces are its slice of the sorted pids, offset by
+        # the number of internal faces
+        uboundaries, nfaces_per_boundary, starts, isort = ugrid._get_pid_index()
+        startfaces = starts + ninternal_faces
         nboundaries = len(uboundaries)
         boundary_file.write('%i\n' % nboundaries)
         boundary_file.write('(\n')
@@ -93,24 +164,12 @@ def _write_boundary(ugrid, boundary_filename, tag_filename):
         tagger = TagReader()
         tag_data = tagger.read_tag_filename(tag_filename)
 
-
-        isort = argsort(ugrid.pids)
-        ugrid.pids.sort()
-        #print(isort)
-        pids = ugrid.pids
-        for iboundary in uboundaries:
+        for iboundary, nfaces, startface in zip(uboundaries, nfaces_per_boundary, startfaces):
             data = tag_data[iboundary]
             #name, is_visc, is_recon, is_rebuild, is_fixed, is_source,
             #is_trans, is_delete, bl_spacing, bl_thickness, nlayers = data
             name = data[0]
 
-            i = where(iboundary == pids)[0]
-            nfaces = i.max() - i.min() + 1
-            startface = i.min()
-
-            if len(i) != nfaces:
-                msg = 'The data is unsorted...len(i)=%s nfaces=%s' % (len(i), nfaces)
-                raise RuntimeError(msg)
             boundary_file.write('    %s\n' % name)
             boundary_file.write('    {\n')
             boundary_file.write('        type patch;\n')
@@ -121,8 +180,25 @@ def _write_boundary(ugrid, boundary_filename, tag_filename):
         boundary_file.write(')\n')
     ugrid.isort = isort
 
-def _write_faces(ugrid, faces_filename):
-    """writes an OpenFOAM faces file"""
+def _write_faces(ugrid, faces_filename, owner_filename, neighbour_filename):
+    """
+    Writes the OpenFOAM faces, owner and neighbour files
+
+    The internal faces are written first in upper triangular order
+    (sorted by owner and then neighbour), followed by the boundary faces
+    sorted by the pid of the matching surface element (tri/quad).
+
+    Returns
+    -------
+    faces : (nfaces, 4) int ndarray
+        the 0-based node ids of the faces in the order they're written;
+        triangles are padded with -1
+    owners : (nfaces, ) int ndarray
+        the 0-based cell of each face
+    neighbours : (ninternal_faces, ) int ndarray
+        the 0-based other cell of each internal face, which is larger
+        than the owner
+    """
     nhexas = ugrid.hexas.shape[0]
     npenta6s = ugrid.penta6s.shape[0]
     npenta5s = ugrid.penta5s.shape[0]
@@ -133,276 +209,337 @@ def _write_faces(ugrid, faces_filename):
     nfaces = ntri_faces + nquad_faces
     assert nfaces > 0, nfaces
 
-    #tri_face_to_eids = ones((nt, 2), dtype='int32')
-    tri_face_to_eids = defaultdict(list)
-
-    #quad_face_to_eids = ones((nq, 2), dtype='int32')
-    quad_face_to_eids = defaultdict(list)
-
+    # the faces (in element order), their sorted node ids (the key to find
+    # the unique faces) and the element that each face came from;
+    # int32 like the ugrid node ids, so the sort/pairing moves half the bytes
     tri_faces = zeros((ntri_faces, 3), dtype='int32')
     quad_faces = zeros((nquad_faces, 4), dtype='int32')
-
-    with open(faces_filename, 'wb') as faces_file:
+    tri_faces_sort = zeros((ntri_faces, 3), dtype='int32')
+    quad_faces_sort = zeros((nquad_faces, 4), dtype='int32')
+    tri_face_eids = zeros(ntri_faces, dtype='int32')
+    quad_face_eids = zeros(nquad_faces, dtype='int32')
+
+    it = 0
+    iq = 0
+    eid = 1
+    if ntets:
+        tets = ugrid.tets - 1
+        it = _fill_faces(tets, _TET_FACES,
+                         tri_faces, tri_faces_sort, tri_face_eids, it, eid)
+        eid += ntets
+
+    ugrid.log.debug('HEXA it=%s iq=%s' % (it, iq))
+    if nhexas:
+        hexas = ugrid.hexas - 1
+        iq = _fill_faces(hexas, _HEXA_FACES,
+                         quad_faces, quad_faces_sort, quad_face_eids, iq, eid)
+        eid += nhexas
+
+    ugrid.log.debug('PENTA5 it=%s iq=%s' % (it, iq))
+    if npenta5s:
+        penta5s = ugrid.penta5s - 1
+        it = _fill_faces(penta5s, _PENTA5_TRI_FACES,
+                         tri_faces, tri_faces_sort, tri_face_eids, it, eid)
+        iq = _fill_faces(penta5s, _PENTA5_QUAD_FACES,
+                         quad_faces, quad_faces_sort, quad_face_eids, iq, eid)
+        eid += npenta5s
+
+    ugrid.log.debug('PENTA6 it=%s iq=%s' % (it, iq))
+    if npenta6s:
+        penta6s = ugrid.penta6s - 1
+        it = _fill_faces(penta6s, _PENTA6_TRI_FACES,
+                         tri_faces, tri_faces_sort, tri_face_eids, it, eid)
+        iq = _fill_faces(penta6s, _PENTA6_QUAD_FACES,
+                         quad_faces, quad_faces_sort, quad_face_eids, iq, eid)
+        eid += npenta6s
+    assert it == ntri_faces, 'it=%s ntri_faces=%s' % (it, ntri_faces)
+    assert iq == nquad_faces, 'iq=%s nquad_faces=%s' % (iq, nquad_faces)
+
+    # find the unique faces; the unsorted faces keep the winding
+    ugrid.log.debug('nt=%s nq=%s' % (ntri_faces, nquad_faces))
+
+    tri_faces_out, tri_owners, tri_neighbors = _pair_faces(
+        tri_faces, tri_faces_sort, tri_face_eids)
+    quad_faces_out, quad_owners, quad_neighbors = _pair_faces(
+        quad_faces, quad_faces_sort, quad_face_eids)
+
+    # the surface elements define the boundary patches
+    ntris = ugrid.tris.shape[0]
+    nquads = ugrid.quads.shape[0]
+    nshells = ntris + nquads
+    shells = np.full((nshells, 4), -1, dtype='int32')
+    if ntris:
+        shells[:ntris, :3] = ugrid.tris - 1
+    if nquads:
+        shells[ntris:, :] = ugrid.quads - 1
+    faces, owners, neighbours = _order_faces(
+        tri_faces_out, tri_owners, tri_neighbors,
+        quad_faces_out, quad_owners, quad_neighbors,
+        shells, ugrid.pids[:nshells])
+
+    nfaces_out = faces.shape[0]
+    with open(faces_filename, 'w') as faces_file:
+        _write_foam_header(faces_file, 'faceList', 'faces')
         faces_file.write('\n\n')
-        #faces_file.write('%i\n' % (nnodes))
+        faces_file.write('%i\n' % nfaces_out)
         faces_file.write('(\n')
-
-        it_start = {}
-        iq_start = {}
-        min_eids = {}
-        it = 0
-        iq = 0
-        eid = 1
-        it_start[1] = it
-        iq_start[1] = iq
-        min_eids[eid] = ugrid.tets
-        for element in ugrid.tets - 1:
-            (n1, n2, n3, n4) = element
-            face1 = [n3, n2, n1]
-            face2 = [n1, n2, n4]
-            face3 = [n4, n3, n1]
-            face4 = [n2, n3, n4]
-
-            tri_faces[it, :] = face1
-            tri_faces[it+1, :] = face2
-            tri_faces[it+2, :] = face3
-            tri_faces[it+3, :] = face4
-
-            face1.sort()
-            face2.sort()
-            face3.sort()
-            face4.sort()
-            tri_face_to_eids[tuple(face1)].append(eid)
-            tri_face_to_eids[tuple(face2)].append(eid)
-            tri_face_to_eids[tuple(face3)].append(eid)
-            tri_face_to_eids[tuple(face4)].append(eid)
-            it += 4
-            eid += 1
-
-        it_start[2] = it
-        iq_start[2] = iq
-        min_eids[eid] = ugrid.hexas
-        ugrid.log.debug('HEXA it=%s iq=%s' % (it, iq))
-        for element in ugrid.hexas-1:
-            (n1, n2, n3, n4, n5, n6, n7, n8) = element
-
-            face1 = [n1, n2, n3, n4]
-            face2 = [n2, n6, n7, n3]
-            face3 = [n6, n5, n8, n7]
-            face4 = [n5, n1, n4, n8]
-            face5 = [n4, n3, n7, n8]
-            face6 = [n5, n6, n2, n1]
-
-            quad_faces[iq, :] = face1
-            quad_faces[iq+1, :] = face2
-            quad_faces[iq+2, :] = face3
-            quad_faces[iq+3, :] = face4
-            quad_faces[iq+4, :] = face5
-            quad_faces[iq+5, :] = face6
-
-            face1.sort()
-            face2.sort()
-            face3.sort()
-            face4.sort()
-            face5.sort()
-            face6.sort()
-
-            quad_face_to_eids[tuple(face1)].append(eid)
-            quad_face_to_eids[tuple(face2)].append(eid)
-            quad_face_to_eids[tuple(face3)].append(eid)
-            quad_face_to_eids[tuple(face4)].append(eid)
-            quad_face_to_eids[tuple(face5)].append(eid)
-            quad_face_to_eids[tuple(face6)].append(eid)
-            iq += 6
-            eid += 1
-
-        it_start[3] = it
-        iq_start[3] = iq
-        min_eids[eid] = ugrid.penta5s
-        ugrid.log.debug('PENTA5 it=%s iq=%s' % (it, iq))
-        for element in ugrid.penta5s-1:
-            (n1, n2, n3, n4, n5) = element
-
-            face1 = [n2, n3, n5]
-            face2 = [n1, n2, n5]
-            face3 = [n4, n1, n5]
-            face4 = [n5, n3, n4]
-            face5 = [n4, n3, n2, n1]
-
-            tri_faces[it, :] = face1
-            tri_faces[it+1, :] = face2
-            tri_faces[it+2, :] = face3
-            tri_faces[it+3, :] = face4
-            quad_faces[iq, :] = face5
-
-            face1.sort()
-            face2.sort()
-            face3.sort()
-            face4.sort()
-            face5.sort()
-
-            tri_face_to_eids[tuple(face1)].append(eid)
-            tri_face_to_eids[tuple(face2)].append(eid)
-            tri_face_to_eids[tuple(face3)].append(eid)
-            tri_face_to_eids[tuple(face4)].append(eid)
-            quad_face_to_eids[tuple(face5)].append(eid)
-
-            it += 4
-            iq += 1
-            eid += 1
-
-        it_start[4] = it
-        iq_start[4] = iq
-        min_eids[eid] = ugrid.penta6s
-        ugrid.log.debug('PENTA6 it=%s iq=%s' % (it, iq))
-        for element in ugrid.penta6s-1:
-            (n1, n2, n3, n4, n5, n6) = element
-
-            face1 = [n1, n2, n3]
-            face2 = [n5, n4, n6]
-            face3 = [n2, n5, n6, n3]
-            face4 = [n4, n1, n3, n6]
-            face5 = [n4, n5, n2, n1]
-
-            tri_faces[it, :] = face1
-            tri_faces[it+1, :] = face2
-            quad_faces[iq, :] = face3
-            quad_faces[iq+1, :] = face4
-            quad_faces[iq+2, :] = face5
-
-            face1.sort()
-            face2.sort()
-            face3.sort()
-            face4.sort()
-            face5.sort()
-
-            tri_face_to_eids[tuple(face1)].append(eid)
-            tri_face_to_eids[tuple(face2)].append(eid)
-            quad_face_to_eids[tuple(face3)].append(eid)
-            quad_face_to_eids[tuple(face4)].append(eid)
-            quad_face_to_eids[tuple(face5)].append(eid)
-            it += 2
-            iq += 3
-            eid += 1
-
-        # find the unique faces
-        tri_faces_sort = deepcopy(tri_faces)
-        quad_faces_sort = deepcopy(quad_faces)
-        #print('t0', tri_faces_sort[0, :])
-        #print('t1', tri_faces_sort[1, :])
-
-        ugrid.log.debug('nt=%s nq=%s' % (ntri_faces, nquad_faces))
-        tri_faces_sort.sort(axis=1)
-        #for i, tri in enumerate(tri_faces):
-            #assert tri[2] > tri[0], 'i=%s tri=%s' % (i, tri)
-        #print('*t0', tri_faces_sort[0, :])
-        #print('*t1', tri_faces_sort[1, :])
-
-        quad_faces_sort.sort(axis=1)
-        #for i, quad in enumerate(quad_faces):
-            #assert quad[3] > quad[0], 'i=%s quad=%s' % (i, quad)
-
-
-        #iq_start_keys = iq_start.keys()
-        #it_start_keys = it_start.keys()
-        #iq_start_keys.sort()
-        #it_start_keys.sort()
-
-        unused_face_to_eid = []
-
-        eid_keys = min_eids.keys()
-        eid_keys.sort()
-
-        type_mapper = {
-            1 : 'tets',
-            2 : 'hexas',
-            3 : 'penta5s',
-            4 : 'penta6s',
-        }
-        ugrid.log.info("eid_keys = %s" % eid_keys)
-        for face, eids in tri_face_to_eids.items():
-            if len(eids) == 1:
-                #if it's a boundary face, wer're fine, otherwise, error...
-                #print('*face=%s eids=%s' % (face, eids))
-                #pid = lookup from quads/tris
-                eid = eids[0]
-                unused_owner = eid
-                unused_neighbor = -1
-                continue
-                #raise RuntimeError()
-
-            e1, e2 = eids
-            i1 = searchsorted(eid_keys, e1)
-            i2 = searchsorted(eid_keys, e2)
-
-            if i1 == 1: # tet
-                it1 = (e1-1) * 4
-                it2 = (e1-1) * 4 + 4
-                faces1_sort = tri_faces_sort[it1:it2, :]
-                faces1_unsorted = tri_faces[it1:it2, :]
-
-                #print("faces1 = \n", faces1_sort, '\n')
-
-                # figure out irow; 3 for the test case
-                face = array(face, dtype='int32')
-
-                #print('face  = %s' % face)
-                #print('face3 = %s' % faces1_sort[3, :])
-
-                if allclose(face, faces1_sort[0, :]):
-                    n1 = 0
-                elif allclose(face, faces1_sort[1, :]):
-                    n1 = 1
-                elif allclose(face, faces1_sort[2, :]):
-                    n1 = 2
-                elif allclose(face, faces1_sort[3, :]):
-                    n1 = 3
-                else:
-                    raise RuntimeError('cant find face=%s in faces for eid1=%s' % (face, e1))
-
-                if allclose(face, faces1_unsorted[n1, :]):
-                    unused_owner = e1
-                    unused_neighbor = e2
-                else:
-                    unused_owner = e2
-                    unused_neighbor = e1
-                unused_face_new = faces1_unsorted[n1, :]
-
-            elif i1 == 2:  # CHEXA
-                iq1 = iq_start[2]
-                unused_iq2 = iq1 + 6
-
-            elif i1 == 3:  # CPENTA5
-                #e1_new = e1 - eid_keys[2]
-                iq1 = iq_start[3]
-                unused_iq2 = iq1 + 1
-                it1 = it_start[3]
-                it2 = it1 + 4
-            elif i1 == 4:  # CPENTA6
-                iq1 = iq_start[4]
-                unused_iq2 = iq1 + 3
-                it1 = it_start[4]
-                it2 = it1 + 2
-            else:
-                raise NotImplementedError('This is a %s and is not supported' % type_mapper[i1])
-
-            # do we need to check this???
-            if 0:
-                if i2 == 1: # tet
-
-                    it1 = it_start_keys[i1]
-                    it2 = it1 + 4
-                    unused_faces2 = tri_faces_sort[it1:it2, :]
-                    #print('face=%s eids=%s' % (face, eids))
-                    #print("faces2 = \n", unused_faces2)
-                    # spits out 3
-                else:
-                    asdf
-            #type1 = type_mapper[i1]
-            #type2 = type_mapper[i2]
-            #if type1:
+        _write_face_list(faces_file, faces)
         faces_file.write(')\n')
-    return
+
+    _write_label_list(owner_filename, 'owner', owners)
+    _write_label_list(neighbour_filename, 'neighbour', neighbours)
+    return faces, owners, neighbours
+
+
+def _order_faces(tri_faces, tri_owners, tri_neighbors,
+                 quad_faces, quad_owners, quad_neighbors,
+                 shells, shell_pids):
+    """
+    Merges the paired tri/quad faces into the OpenFOAM face order and
+    converts the element ids to 0-based cells
+
+    Parameters
+    ----------
+    shells : (nshells, 4) int ndarray
+        the 0-based node ids of the surface elements; triangles are padded
+        with -1; if there are no shells, the boundary faces aren't sorted
+    shell_pids : (nshells, ) int ndarray
+        the pid of each surface element
+
+    Returns
+    -------
+    faces : (nfaces, 4) int ndarray
+        the faces; triangles are padded with -1
+    owners : (nfaces, ) int ndarray
+        the 0-based cell of each face
+    neighbours : (ninternal_faces, ) int ndarray
+        the 0-based other cell of each internal face
+    """
+    ntri_faces = tri_faces.shape[0]
+    nfaces = ntri_faces + quad_faces.shape[0]
+    faces = np.full((nfaces, 4), -1, dtype='int32')
+    faces[:ntri_faces, :3] = tri_faces
+    faces[ntri_faces:, :] = quad_faces
+    owners = np.hstack([tri_owners, quad_owners]) - 1
+    neighbors = np.hstack([tri_neighbors, quad_neighbors]) - 1
+
+    # the owner is the lower element id, so owner < neighbour
+    is_internal = neighbors >= 0
+    iinternal = where(is_internal)[0]
+    iinternal = iinternal[np.lexsort((neighbors[iinternal], owners[iinternal]))]
+    iboundary = where(~is_internal)[0]
+    nshells = shells.shape[0]
+    if nshells:
+        nboundary = len(iboundary)
+        if nboundary != nshells:
+            raise RuntimeError('nboundary_faces=%s nshells=%s; each boundary face needs '
+                               'one surface element' % (nboundary, nshells))
+        ishell = _find_shells(np.sort(faces[iboundary, :], axis=1), np.sort(shells, axis=1))
+        iboundary = iboundary[argsort(shell_pids[ishell], kind='stable')]
+    iface = np.hstack([iinternal, iboundary])
+    return faces[iface, :], owners[iface], neighbors[iinternal]
+
+
+def _find_shells(faces_sort, shells_sort):
+    """
+    Finds the surface element that matches each face
+
+    Parameters
+    ----------
+    faces_sort : (nfaces, nnodes_per_face) int ndarray
+        the faces with the node ids sorted
+    shells_sort : (nshells, nnodes_per_face) int ndarray
+        the surface elements with the node ids sorted
+
+    Returns
+    -------
+    ishell : (nfaces, ) int ndarray
+        the index of the shell with the same nodes as each face
+    """
+    nfaces = faces_sort.shape[0]
+    nshells = shells_sort.shape[0]
+    rows = np.vstack([shells_sort, faces_sort])
+    is_face = np.hstack([np.zeros(nshells, dtype='bool'), np.ones(nfaces, dtype='bool')])
+
+    # sort by the nodes and then put the shells first, so each face
+    # comes right after its matching shell
+    irow = np.lexsort(np.vstack([is_face, rows.T[::-1]]))
+    iface_sorted = where(is_face[irow])[0]
+    iprevious = irow[np.maximum(iface_sorted - 1, 0)]
+    iface = irow[iface_sorted]
+    is_match = (iface_sorted > 0) & ~is_face[iprevious] & (
+        rows[iprevious, :] == rows[iface, :]).all(axis=1)
+    if not is_match.all():
+        raise RuntimeError('boundary faces without a surface element; faces=%s' % (
+            rows[iface[~is_match], :]))
+
+    ishell = np.zeros(nfaces, dtype=irow.dtype)
+    ishell[iface - nshells] = iprevious
+    return ishell
+
+
+def _write_face_list(faces_file, faces):
+    """
+    Writes the faces as 3(a b c)/4(a b c d) lines with one savetxt per
+    face type rather than a write per face
+
+    Parameters
+    ----------
+    faces : (nfaces, 4) int ndarray
+        the faces; triangles are padded with -1
+    """
+    nfaces = faces.shape[0]
+    if nfaces == 0:
+        return
+    is_tri = faces[:, 3] == -1
+    lines = np.empty(nfaces, dtype='object')
+    for iface, nnodes, fmt in ((where(is_tri)[0], 3, '3(%i %i %i)'),
+                               (where(~is_tri)[0], 4, '4(%i %i %i %i)')):
+        if len(iface) == 0:
+            continue
+        text = StringIO()
+        np.savetxt(text, faces[iface, :nnodes], fmt=fmt)
+        lines[iface] = text.getvalue().splitlines()
+    faces_file.write('\n'.join(lines) + '\n')
+
+
+def _write_label_list(label_filename, object_name, labels):
+    """writes an OpenFOAM labelList file (e.g., owner, neighbour)"""
+    with open(label_filename, 'w') as label_file:
+        _write_foam_header(label_file, 'labelList', object_name)
+        label_file.write('\n\n')
+        label_file.write('%i\n' % len(labels))
+        label_file.write('(\n')
+        np.savetxt(label_file, labels, fmt='%i')
+        label_file.write(')\n')
+
+
+def _fill_faces(elements, face_templates, faces, faces_sort, face_eids, iface, eid):
+    """
+    Fills the faces of a single element type
+
+    Parameters
+    ----------
+    elements : (nelements, nnodes) int ndarray
+        the 0-based node ids
+    face_templates : (nfaces_per_element, nnodes_per_face) int ndarray
+        the element's local node indices for each face
+    faces : (nfaces_total, nnodes_per_face) int ndarray
+        the faces to fill; the faces of an element are consecutive
+    faces_sort : (nfaces_total, nnodes_per_face) int ndarray
+        the faces to fill with the node ids sorted
+    face_eids : (nfaces_total, ) int ndarray
+        the element id of each face to fill
+    iface : int
+        the first face to fill
+    eid : int
+        the element id of the first element
+
+    Returns
+    -------
+    iface : int
+        the next face to fill
+    """
+    nelements = elements.shape[0]
+    nfaces_per_element, nnodes_per_face = face_templates.shape
+    iend = iface + nfaces_per_element * nelements
+    if IS_NUMBA:
+        # fills and sorts each face in the same pass
+        _fill_faces_kernel(elements, face_templates, faces, faces_sort, face_eids,
+                           iface, eid)
+        return iend
+
+    # a single gather of every face of every element;
+    # (nelements, nfaces_per_element, nnodes_per_face) is already element-major
+    faces[iface:iend, :] = elements[:, face_templates].reshape(-1, nnodes_per_face)
+    faces_sort[iface:iend, :] = np.sort(faces[iface:iend, :], axis=1)
+    face_eids[iface:iend] = np.repeat(
+        arange(eid, eid + nelements, dtype=face_eids.dtype), nfaces_per_element)
+    return iend
+
+
+def _pair_faces(faces, faces_sort, face_eids):
+    """
+    Finds the owner/neighbor of every unique face
+
+    Parameters
+    ----------
+    faces : (nfaces, nnodes_per_face) int ndarray
+        the faces in the node order of their element
+    faces_sort : (nfaces, nnodes_per_face) int ndarray
+        the faces with the node ids sorted, which is the key for a face
+    face_eids : (nfaces, ) int ndarray
+        the element id of each face, which must be sorted
+
+    Returns
+    -------
+    unique_faces : (nunique, nnodes_per_face) int ndarray
+        the faces in the node order of the owner
+    owners : (nunique, ) int ndarray
+        the element that owns the face (the lower element id)
+    neighbors : (nunique, ) int ndarray
+        the other element on the face; -1 for a boundary face
+    """
+    nfaces = faces.shape[0]
+    if nfaces == 0:
+        return faces, face_eids, face_eids.copy()
+
+    # the sorts are stable and the faces are in element order, so the
+    # copies of a face are adjacent with the lower element id (the owner) first
+    keys = _pack_face_keys(faces_sort)
+    is_first = np.ones(nfaces, dtype='bool')
+    if keys is None:
+        # lexsort's primary key is the last row, so reverse the columns
+        iface_sort = np.lexsort(faces_sort.T[::-1])
+        faces_sorted = faces_sort[iface_sort, :]
+        is_first[1:] = (faces_sorted[1:, :] != faces_sorted[:-1, :]).any(axis=1)
+    else:
+        iface_sort = argsort(keys, kind='stable')
+        keys_sorted = keys[iface_sort]
+        is_first[1:] = keys_sorted[1:] != keys_sorted[:-1]
+    istart = where(is_first)[0]
+    counts = np.diff(np.append(istart, nfaces))
+    if counts.max() > 2:
+        iface = istart[counts > 2]
+        raise RuntimeError('faces are shared by more than 2 elements; faces=%s' % (
+            faces_sort[iface_sort[iface], :]))
+
+    iowner = iface_sort[istart]
+    owners = face_eids[iowner]
+
+    is_internal = counts == 2
+    neighbors = np.full(len(counts), -1, dtype=face_eids.dtype)
+    neighbors[is_internal] = face_eids[iface_sort[istart[is_internal] + 1]]
+    return faces[iowner, :], owners, neighbors
+
+
+def _pack_face_keys(faces_sort):
+    """
+    Packs the sorted node ids of each face into a single uint64, so the
+    faces may be sorted/compared as one key rather than column by column
+
+    Parameters
+    ----------
+    faces_sort : (nfaces, nnodes_per_face) int ndarray
+        the faces with the 0-based node ids sorted
+
+    Returns
+    -------
+    keys : (nfaces, ) uint64 ndarray or None
+        the keys, which sort in the same order as the rows;
+        None if the node ids are too large to fit
+    """
+    nnodes_per_face = faces_sort.shape[1]
+    nbits = max(int(faces_sort[:, -1].max()).bit_length(), 1)
+    if nbits * nnodes_per_face > 64:
+        return None
+
+    shift = np.uint64(nbits)
+    keys = faces_sort[:, 0].astype('uint64')
+    for j in range(1, nnodes_per_face):
+        keys <<= shift
+        keys |= faces_sort[:, j].astype('uint64')
+    return keys
 
 
 def main():  # pragma: no cover
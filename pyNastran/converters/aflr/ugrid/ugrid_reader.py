@@ -4,11 +4,11 @@ Defines the following classes:
 
 """
 import os
-from struct import Struct, unpack
+from struct import Struct
 import sys
 import numpy as np
 from numpy import zeros, unique, array
-from numpy import arange, hstack, setdiff1d, union1d
+from numpy import arange
 from cpylog import get_logger
 
 #from pyNastran.bdf.field_writer_double import print_card_double
@@ -17,6 +17,99 @@ from cpylog import get_logger
 
 from pyNastran.bdf.field_writer_8 import print_float_8
 from pyNastran.bdf.field_writer_16 import print_float_16
+from pyNastran.bdf.field_writer_double import print_scientific_double
+try:
+    from numba import njit, prange
+    IS_NUMBA = True
+except ImportError:  # pragma: no cover
+    IS_NUMBA = False
+
+
+# the nnodes, ntris, nquads, ntets, npenta5s, npenta6s, nhexas header
+_HEADER = {
+    '<': Struct('<7i'),
+    '>': Struct('>7i'),
+}
+
+# file_format (e.g., the b8 in model.b8.ugrid) -> (ndarray_float, float_fmt, nfloat, endian)
+#   b:  C binary, big endian
+#   lb: C binary, little endian
+_FILE_FORMATS = {
+    'b8': ('float64', 'd', 8, '>'),
+    'lb8': ('float64', 'd', 8, '<'),
+    'b4': ('float32', 'f', 4, '>'),
+    'lb4': ('float32', 'f', 4, '<'),
+}
+
+# the local node ids of the faces of each solid
+_TET_FACES = np.array([[0, 1, 2], [0, 1, 3], [1, 2, 3], [0, 2, 3]], dtype='intp')
+# btm (1-2-3-4)
+# top (5-6-7-8)
+# left (1-4-8-5
+# right (2-3-7-6)
+# front (1-2-6-5)
+# back (4-3-7-8)
+_HEXA_FACES = np.array([[0, 1, 2, 3], [4, 5, 6, 7], [0, 3, 7, 4],
+                        [1, 2, 6, 5], [0, 1, 5, 4], [3, 2, 6, 7]], dtype='intp')
+_PENTA5_TRI_FACES = np.array([[0, 1, 4], [1, 2, 4], [2, 3, 4], [3, 0, 4]], dtype='intp')
+_PENTA5_QUAD_FACES = np.array([[0, 1, 2, 3]], dtype='intp')
+_PENTA6_TRI_FACES = np.array([[0, 1, 2], [3, 4, 5]], dtype='intp')
+_PENTA6_QUAD_FACES = np.array([[0, 1, 4, 3], [1, 2, 5, 4], [2, 0, 3, 5]], dtype='intp')
+
+
+if IS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _is_repeated_node_kernel(elements, is_repeated):  # pragma: no cover
+        """numba kernel for ``_is_repeated_node``"""
+        nnodes = elements.shape[1]
+        for ielement in prange(elements.shape[0]):
+            for i in range(nnodes - 1):
+                for j in range(i + 1, nnodes):
+                    if elements[ielement, i] == elements[ielement, j]:
+                        is_repeated[ielement] = True
+
+    @njit(cache=True)
+    def _write_int_8(out, i, value):  # pragma: no cover
+        """writes a positive integer as a left justified 8 character field"""
+        ndigits = 1
+        tens = value // 10
+        while tens > 0:
+            ndigits += 1
+            tens //= 10
+        for j in range(ndigits - 1, -1, -1):
+            out[i + j] = 48 + value % 10  # ord('0')
+            value //= 10
+        for j in range(ndigits, 8):
+            out[i + j] = 32  # ord(' ')
+
+    @njit(parallel=True, cache=True)
+    def _format_elements_8_kernel(card_name, eids, pids, elements, out,
+                                  nbytes_per_line):  # pragma: no cover
+        """numba kernel for ``_write_elements``; writes 8 fields per line"""
+        nfields = elements.shape[1] + 2
+        for ielement in prange(elements.shape[0]):
+            i = ielement * nbytes_per_line
+            for j in range(8):
+                out[i + j] = card_name[j]
+            i += 8
+            for ifield in range(nfields):
+                if ifield == 8:
+                    # continuation line
+                    out[i] = 10  # ord('\n')
+                    i += 1
+                    for j in range(8):
+                        out[i + j] = 32
+                    i += 8
+
+                if ifield == 0:
+                    value = eids[ielement]
+                elif ifield == 1:
+                    value = pids[ielement]
+                else:
+                    value = elements[ielement, ifield - 2]
+                _write_int_8(out, i, value)
+                i += 8
+            out[i] = 10
 
 
 def read_ugrid(ugrid_filename=None,
@@ -113,7 +206,7 @@ class UGRID:
             data = ugrid_file.read(7 * 4)
             self.n += 7 * 4
 
-            nnodes, ntris, nquads, ntets, npenta5s, npenta6s, nhexas = unpack(endian + '7i', data)
+            nnodes, ntris, nquads, ntets, npenta5s, npenta6s, nhexas = _HEADER[endian].unpack(data)
             npids = nquads + ntris
             nvol_elements = ntets + npenta5s + npenta6s + nhexas
             self.log.info('nnodes=%.3fm ntris=%s nquads=%s ntets=%.3fm'
@@ -135,20 +228,32 @@ class UGRID:
             #pids = zeros(npids, dtype='int32')
             #nodes = array([], dtype='float32')
 
+            # read all the blocks with a single call into one buffer; the
+            # arrays are views into (or native byte order copies of) it
+            nbytes_shells = nnodes * 3 * nfloat + (ntris * 3 + nquads * 4 + npids) * 4
+            nbytes_solids = (ntets * 4 + npenta5s * 5 + npenta6s * 6 + nhexas * 8) * 4
+            nbytes_total = nbytes_shells + nbytes_solids if self.read_solids else nbytes_shells
+            data = bytearray(nbytes_total)
+            ndata = ugrid_file.readinto(data)
+            if ndata != nbytes_total:
+                raise RuntimeError('ndata=%s nbytes_expected=%s; nnodes=%s ntris=%s nquads=%s '
+                                   'ntets=%s npenta5s=%s npenta6s=%s nhexas=%s' % (
+                                       ndata, nbytes_total, nnodes, ntris, nquads,
+                                       ntets, npenta5s, npenta6s, nhexas))
+            offset = 0
+
             ## NODES
             nbytes_expected = nnodes * 3 * nfloat
-            data = ugrid_file.read(nbytes_expected)
+            nodes, offset = _read_block(data, offset, endian + float_fmt, ndarray_float,
+                                        nnodes, 3)
             self.n += nbytes_expected
-            dtype = endian + float_fmt
-            nodes = np.frombuffer(data, dtype=dtype).reshape((nnodes, 3)).copy()
             #print('min xyz value = ' , nodes.min())
             #print('max xyz value = ' , nodes.max())
 
             ## CTRIA3
             dtype = endian + 'i'
             if ntris:
-                data = ugrid_file.read(ntris * 3 * 4)
-                tris = np.frombuffer(data, dtype=dtype).reshape((ntris, 3)).copy()
+                tris, offset = _read_block(data, offset, dtype, 'int32', ntris, 3)
                 self.n += ntris * 3 * 4
                 #print('min tris value = ' , tris.min())
                 #print('max tris value = ' , tris.max())
@@ -157,20 +262,15 @@ class UGRID:
             ## CQUAD4
             if nquads:
                 nbytes_expected = nquads * 4 * 4
-                data = ugrid_file.read(nbytes_expected)
+                quads, offset = _read_block(data, offset, dtype, 'int32', nquads, 4)
                 self.n += nbytes_expected
-                assert len(data) == nbytes_expected, 'ndata=%s nbytes_expected=%s nquads_actual=%g nquads=%s' % (
-                        len(data), nbytes_expected, len(data)/16., nquads)
-                quads = np.frombuffer(data, dtype=dtype).reshape((nquads, 4)).copy()
                 #print('min quads value = ' , quads.min())
                 #print('max quads value = ' , quads.max())
 
             if npids:
                 nbytes_expected = npids * 4
-                data = ugrid_file.read(nbytes_expected)
-                assert len(data) == nbytes_expected, 'len(data)=%s' % (len(data))
+                pids, offset = _read_block(data, offset, dtype, 'int32', npids, None)
                 self.n += nbytes_expected
-                pids = np.frombuffer(data, dtype=dtype).copy()
                 self.pids = pids
                 #print('min pids value = ' , pids.min())
                 #print('max pids value = ' , pids.max())
@@ -187,16 +287,15 @@ class UGRID:
                 #self.nodes = self.nodes[inid]
                 return
 
-            tets = zeros(ntets * 4, dtype='int32')
-            penta5s = zeros(npenta5s * 5, dtype='int32')
-            penta6s = zeros(npenta6s * 6, dtype='int32')
-            hexas = zeros(nhexas * 8, dtype='int32')
+            tets = array([], dtype='int32')
+            penta5s = array([], dtype='int32')
+            penta6s = array([], dtype='int32')
+            hexas = array([], dtype='int32')
 
             if ntets:
                 ## CTETRA
                 nbytes_expected = ntets * 4 * 4
-                data = ugrid_file.read(nbytes_expected)
-                tets = np.frombuffer(data, dtype=dtype).reshape((ntets, 4)).copy()
+                tets, offset = _read_block(data, offset, dtype, 'int32', ntets, 4)
                 self.n += nbytes_expected
                 #print('min tets value = ' , tets.min())
                 #print('max tets value = ' , tets.max())
@@ -204,8 +303,7 @@ class UGRID:
             if npenta5s:
                 ## CPYRAM
                 nbytes_expected = npenta5s * 5 * 4
-                data = ugrid_file.read(nbytes_expected)
-                penta5s = np.frombuffer(data, dtype=dtype).reshape((npenta5s, 5)).copy()
+                penta5s, offset = _read_block(data, offset, dtype, 'int32', npenta5s, 5)
                 self.n += nbytes_expected
                 #print('min penta5s value = ' , penta5s.min())
                 #print('max penta5s value = ' , penta5s.max())
@@ -213,8 +311,7 @@ class UGRID:
             if npenta6s:
                 ## CPENTA
                 nbytes_expected = npenta6s * 6 * 4
-                data = ugrid_file.read(nbytes_expected)
-                penta6s = np.frombuffer(data, dtype=dtype).reshape((npenta6s, 6)).copy()
+                penta6s, offset = _read_block(data, offset, dtype, 'int32', npenta6s, 6)
                 self.n += nbytes_expected
                 #print('min penta6s value = ' , penta6s.min())
                 #print('max penta6s value = ' , penta6s.max())
@@ -222,12 +319,8 @@ class UGRID:
             if nhexas:
                 ## CHEXA
                 nbytes_expected = nhexas * 8 * 4
-                data = ugrid_file.read(nbytes_expected)
-                ndata = len(data)
-                assert ndata == nbytes_expected, 'ndata=%s nbytes_expected=%s nhexas_actual=%g nhexas=%s' % (
-                        ndata, nbytes_expected, ndata/32., nhexas)
-                hexas = np.frombuffer(data, dtype=dtype).reshape((nhexas, 8)).copy()
-                self.n += nhexas * 8 * 4
+                hexas, offset = _read_block(data, offset, dtype, 'int32', nhexas, 8)
+                self.n += nbytes_expected
                 #print('min hexas value = ' , hexas.min())
                 #print('max hexas value = ' , hexas.max())
 
@@ -272,79 +365,37 @@ class UGRID:
             if write_grids:
                 if not self.read_solids:
                     nids_to_write = np.unique(np.hstack([self.quads.ravel(), self.tris.ravel()]))
-                    nnodes = self.nodes.shape[0]
-                    all_nids = np.arange(nnodes, dtype='int32')
-                    inid = np.searchsorted(all_nids, nids_to_write)
-                    unused_nodes = self.nodes[inid, :]
-
-                    if size == 8:
-                        for i, nid in enumerate(nids_to_write):
-                            if i % 200000:  # pragma: no cover
-                                print('  i = %s' % i)
-                            node = self.nodes[i, :]
-                            bdf_file.write('GRID    %8i%8s%s%s%s\n' % (
-                                nid, '',
-                                print_float_8(node[0]),
-                                print_float_8(node[1]),
-                                print_float_8(node[2])))
-                    else:
-                        for i, nid in enumerate(nids_to_write):
-                            if i % 200000:  # pragma: no cover
-                                print('  i = %s' % i)
-                            node = self.nodes[i, :]
-                            bdf_file.write('GRID*   %16i%16s%16s%16s\n'
-                                           '*       %16s\n' % (
-                                               nid,
-                                               '',
-                                               print_float_16(node[0]),
-                                               print_float_16(node[1]),
-                                               print_float_16(node[2])))
+                    nodes_to_write = self.nodes[nids_to_write - 1, :]
                 else:
                     if check:
                         self.check_hanging_nodes()
-                    if size == 8:
-                        for i, node in enumerate(self.nodes):
-                            node = self.nodes[i, :]
-                            bdf_file.write('GRID    %8i%8s%s%s%s\n' % (
-                                i + 1, '',
-                                print_float_8(node[0]),
-                                print_float_8(node[1]),
-                                print_float_8(node[2])))
-                    else:
-                        for i, node in enumerate(self.nodes):
-                            node = self.nodes[i, :]
-                            bdf_file.write('GRID*   %16i%16s%16s%16s\n'
-                                           '*       %16s\n' % (
-                                               i + 1,
-                                               '',
-                                               print_float_16(node[0]),
-                                               print_float_16(node[1]),
-                                               print_float_16(node[2])))
-
+                    nnodes = self.nodes.shape[0]
+                    nids_to_write = arange(1, nnodes + 1, dtype='int32')
+                    nodes_to_write = self.nodes
+                _write_grids(bdf_file, nids_to_write, nodes_to_write,
+                             size=size, is_double=is_double)
                 self.log.debug('finished writing GRIDs')
 
             eid = 1
             pids = self.pids #+ 1
+            ntris = self.tris.shape[0]
+            nquads = self.quads.shape[0]
             if include_shells:
-                upids = unique(pids)  # auto-sorts
-                for pid in upids:
-                    bdf_file.write('PSHELL,%i,%i, 0.1\n' % (pid, mid))
+                upids = self._get_pid_index()[0]  # sorted
+                if len(upids):
+                    pshells = np.char.mod('PSHELL,%%i,%i, 0.1\n' % mid, upids)
+                    bdf_file.write(''.join(pshells.tolist()))
                 self.log.debug('writing CTRIA3')
-                for element in self.tris:
-                    assert len(np.unique(element)) == 3, element
-                    bdf_file.write('CTRIA3  %-8i%-8i%-8i%-8i%-8i\n' % (
-                        eid, pids[eid-1], element[0], element[1], element[2]))
-                    eid += 1
+                if ntris:
+                    _check_unique_nodes(self.tris, 'CTRIA3')
+                eid = _write_elements(bdf_file, 'CTRIA3', eid, pids[:ntris], self.tris)
 
                 self.log.debug('writing CQUAD4')
-                for element in self.quads:
-                    assert len(np.unique(element)) == 4, element
-                    bdf_file.write('CQUAD4  %-8i%-8i%-8i%-8i%-8i%-8i\n' % (
-                        eid, pids[eid-1], element[0], element[1], element[2], element[3]))
-                    eid += 1
+                if nquads:
+                    _check_unique_nodes(self.quads, 'CQUAD4')
+                eid = _write_elements(bdf_file, 'CQUAD4', eid, pids[ntris:ntris+nquads],
+                                      self.quads)
             else:
-                ntris = self.tris.shape[0]
-                nquads = self.quads.shape[0]
                 eid += ntris + nquads
 
             if len(pids) == 0:
@@ -359,6 +410,35 @@ class UGRID:
                     bdf_file, eid, pid, convert_pyram_to_penta=convert_pyram_to_penta)
             bdf_file.write('ENDDATA\n')
 
+    def _get_pid_index(self):
+        """
+        Gets the unique surface ids and where they are in the sorted pids
+
+        The index isn't cached because pids may be edited in place and the
+        sort is cheap next to the writing.
+
+        Returns
+        -------
+        upids : (nupids, ) int ndarray
+            the sorted unique pids
+        counts : (nupids, ) int ndarray
+            the number of shells with each pid
+        starts : (nupids, ) int ndarray
+            the index of the first shell with each pid in the sorted pids
+        isort : (npids, ) int ndarray
+            the (stable) indices that sort the pids
+        """
+        pids = self.pids
+        npids = len(pids)
+        isort = np.argsort(pids, kind='stable')
+        pids_sorted = pids[isort]
+        is_new_pid = np.ones(npids, dtype='bool')
+        is_new_pid[1:] = pids_sorted[1:] != pids_sorted[:-1]
+        starts = np.flatnonzero(is_new_pid)
+        upids = pids_sorted[starts]
+        counts = np.diff(np.append(starts, npids))
+        return upids, counts, starts, isort
+
     def check_hanging_nodes(self, stop_on_diff=True):
         """verifies that all nodes are used"""
         self.log.debug('checking hanging nodes')
@@ -388,62 +468,50 @@ class UGRID:
             npentas = 0
             nhexas = 0
 
-        nids = []
-        if ntris:
-            nids.append(unique(tris.ravel()))
-        if nquads:
-            nids.append(unique(quads.ravel()))
-
-        if ntets:
-            nids.append(unique(tets.ravel()))
-        if npyramids:
-            nids.append(unique(pyrams.ravel()))
-        if npentas:
-            nids.append(unique(pentas.ravel()))
-        if nhexas:
-            nids.append(unique(hexas.ravel()))
-
+        elements = [tris, quads]
+        if self.read_solids:
+            elements += [tets, pyrams, pentas, hexas]
+        nids = [element.ravel() for element in elements if element.size]
         if len(nids) == 0:
             raise RuntimeError('there are no solid nodes; nids=%s' % nids)
-        elif len(nids) == 1:
-            nids = nids[0]
-        else:
-            nids = unique(hstack(nids))
+        nids = unique(np.concatenate(nids))
 
         diff = []
         if nnodes != len(nids):
             expected = arange(1, nnodes + 1, dtype='int32')
-            print('expected = %s' % expected)
-            print('actual   = %s' % nids)
-
-            diff = setdiff1d(expected, nids)
-            diff2 = setdiff1d(nids, expected)
-            diff = union1d(diff, diff2)
+            self.log.debug('expected = %s' % expected)
+            self.log.debug('actual   = %s' % nids)
+
+            # both are sorted, so a binary search finds the missing/extra
+            # ids without resorting; they're disjoint, so there's no union
+            missing = _get_missing_values(expected, nids)
+            diff2 = _get_missing_values(nids, expected)
+            diff = np.concatenate([missing, diff2])
             msg = 'nnodes=%i len(actual)=%s expected-actual=%s (n=%s) actual-expected=%s (n=%s)' % (
                 nnodes, len(nids),
                 diff, len(diff),
                 diff2, len(diff),
             )
-            print(msg)
-            print('nids = %s' % nids)
+            self.log.warning(msg)
+            self.log.debug('nids = %s' % nids)
             if stop_on_diff:
                 raise RuntimeError(msg)
 
         # check unique node ids
-        for tri in tris:
-            assert len(unique(tri)) == 3, tri
-        for quad in quads:
-            # assert len(unique(quad)) == 4, quad
-            if len(unique(quad)) != 4:
-                print(quad)
-        for tet in tets:
-            assert len(unique(tet)) == 4, tet
-        for pyram in pyrams:
-            assert len(unique(pyram)) == 5, pyram
-        for penta in pentas:
-            assert len(unique(penta)) == 6, penta
-        for hexa in hexas:
-            assert len(unique(hexa)) == 8, hexa
+        if ntris:
+            _check_unique_nodes(tris, 'CTRIA3')
+        if nquads:
+            is_repeated = _is_repeated_node(quads)
+            if is_repeated.any():
+                self.log.warning('CQUAD4s with repeated nodes:\n%s' % quads[is_repeated])
+        if ntets:
+            _check_unique_nodes(tets, 'CTETRA')
+        if npyramids:
+            _check_unique_nodes(pyrams, 'CPYRAM')
+        if npentas:
+            _check_unique_nodes(pentas, 'CPENTA')
+        if nhexas:
+            _check_unique_nodes(hexas, 'CHEXA')
         return diff
 
     def _check_node_ids(self):
@@ -516,73 +584,20 @@ class UGRID:
 
         self.log.debug('writing ugrid=%r' % ugrid_filename)
         with open(ugrid_filename, 'wb') as f_ugrid:
-            sfmt = Struct(endian + '7i')
-            f_ugrid.write(sfmt.pack(nnodes, ntris, nquads, ntets, npyramids, npentas, nhexas))
-
-            #def _write(f_ugrid, nodes_array, endian):
-                #if endian == '<':
-                    #f_ugrid.write(nodes_array.ravel().tobytes())
-                #else:
-                    #nodes_array = nodes_array.byteswap()
-                    #f_ugrid.write(nodes_array.ravel().tobytes())
-
-            #_write(f_ugrid, nodes, endian)
-            #_write(f_ugrid, nodes, endian)
-            #_write(f_ugrid, tris, endian)
-            #_write(f_ugrid, quads, endian)
-            #_write(f_ugrid, pids, endian)
-            #_write(f_ugrid, tets, endian)
-            #_write(f_ugrid, pyrams, endian)
-            #_write(f_ugrid, pentas, endian)
-            #_write(f_ugrid, hexas, endian)
-
-            # %3f or %3d
-            fmt = endian + '%i%s' % (nnodes * 3, float_fmt) # len(x,y,z) = 3
-            sfmt = Struct(fmt)
-            f_ugrid.write(sfmt.pack(*nodes.ravel()))
-
-            # TODO: speed up with numpy
-            if ntris:
-                # CTRIA3
-                fmt = endian + '%ii' % (ntris * 3)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*tris.ravel()))
-
-            if nquads:
-                # QUAD4
-                fmt = endian + '%ii' % (nquads * 4)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*quads.ravel()))
-
-            # PSHELL
-            if nshells:
-                fmt = endian + '%ii' % (nshells)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*pids.ravel()))
-
-            if ntets:
-                # CTETRA
-                fmt = endian + '%ii' % (ntets * 4)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*tets.ravel()))
-
-            if npyramids:
-                # CPYRAM
-                fmt = endian + '%ii' % (npyramids * 5)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*pyrams.ravel()))
-
-            if npentas:
-                # CPENTA
-                fmt = endian + '%ii' % (npentas * 6)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*pentas.ravel()))
-
-            if nhexas:
-                # CHEXA
-                fmt = endian + '%ii' % (nhexas * 8)
-                sfmt = Struct(fmt)
-                f_ugrid.write(sfmt.pack(*hexas.ravel()))
+            f_ugrid.write(_HEADER[endian].pack(
+                nnodes, ntris, nquads, ntets, npyramids, npentas, nhexas))
+
+            # the data is written in the file's byte order, which is a
+            # no-op if it matches the native order; the arrays are written
+            # through their buffer, so there's no intermediate bytes copy
+            int_dtype = np.dtype(endian + 'i4')
+            float_dtype = np.dtype(endian + float_fmt)
+            f_ugrid.write(memoryview(np.ascontiguousarray(nodes, dtype=float_dtype)))
+
+            # CTRIA3, CQUAD4, PSHELL, CTETRA, CPYRAM, CPENTA, CHEXA
+            for elements in (tris, quads, pids, tets, pyrams, pentas, hexas):
+                if len(elements):
+                    f_ugrid.write(memoryview(np.ascontiguousarray(elements, dtype=int_dtype)))
         if check:
             self.check_hanging_nodes()
 
@@ -592,54 +607,32 @@ class UGRID:
         bdf_file.write('PSOLID,%i,1\n' % pid)
         self.log.debug('writing CTETRA')
         bdf_file.write('$ CTETRA\n')
-        for element in self.tets:
-            #card = ['CTETRA', eid, pid] + list(element)
-            #f.write(print_int_card(card))
-            bdf_file.write('CTETRA  %-8i%-8i%-8i%-8i%-8i%-8i\n' % (
-                eid, pid, element[0], element[1], element[2], element[3]))
-            eid += 1
+        eid = _write_elements(bdf_file, 'CTETRA', eid, pid, self.tets)
 
+        penta5s = self.penta5s
         if convert_pyram_to_penta:
             # skipping the penta5s
             self.log.debug('writing CPYRAM as CPENTA with node6=node5')
             bdf_file.write('$ CPYRAM - CPENTA5\n')
-            for element in self.penta5s:
-                bdf_file.write('CPENTA  %-8i%-8i%-8i%-8i%-8i%-8i%-8i%-8i\n' % (
-                    eid, pid, element[0], element[1], element[2], element[3],
-                    element[4], element[4]))
-                eid += 1
+            if len(penta5s):
+                penta5s = np.column_stack([penta5s, penta5s[:, 4]])
+            eid = _write_elements(bdf_file, 'CPENTA', eid, pid, penta5s)
         else:
             self.log.debug('writing CPYRAM')
             bdf_file.write('$ CPYRAM - CPENTA5\n')
-            for element in self.penta5s:
-                bdf_file.write('CPYRAM  %-8i%-8i%-8i%-8i%-8i%-8i%-8i\n' % (
-                    eid, pid, element[0], element[1], element[2], element[3], element[4]))
-                eid += 1
+            eid = _write_elements(bdf_file, 'CPYRAM', eid, pid, penta5s)
 
         self.log.debug('writing CPENTA')
         bdf_file.write('$ CPENTA6\n')
-        for element in self.penta6s:
-            #card = ['CPENTA', eid, pid] + list(element)
-            #f.write(print_int_card(card))
-            bdf_file.write('CPENTA  %-8i%-8i%-8i%-8i%-8i%-8i%-8i%-8i\n' % (
-                eid, pid, element[0], element[1], element[2], element[3], element[4], element[5]))
-            eid += 1
+        eid = _write_elements(bdf_file, 'CPENTA', eid, pid, self.penta6s)
 
         self.log.debug('writing CHEXA')
         bdf_file.write('$ CHEXA\n')
-        for element in self.hexas:
-            #card = ['CHEXA', eid, pid] + list(element)
-            bdf_file.write('CHEXA   %-8i%-8i%-8i%-8i%-8i%-8i%-8i%-8i\n        %-8i%-8i\n' % (
-                eid, pid, element[0], element[1], element[2], element[3],
-                element[4], element[5], element[6], element[7]))
-            #f.write(print_int_card(card))
-            eid += 1
+        eid = _write_elements(bdf_file, 'CHEXA', eid, pid, self.hexas)
         return eid, pid
 
     def skin_solids(self):
         """Finds the CTRIA3s and CQUAD4 elements on the surface of the solid"""
-        tris = []
-        quads = []
         nhexas = self.hexas.shape[0]
         npenta6s = self.penta6s.shape[0]
         npenta5s = self.penta5s.shape[0]
@@ -648,113 +641,223 @@ class UGRID:
         nquads = nhexas * 6 + npenta5s + 3 * npenta6s
         ntris = npenta5s * 4 + npenta6s * 2 + ntets * 4
         self.log.info('ntris=%s nquads=%s' % (ntris, nquads))
-        if ntris:
-            tris = zeros((ntris, 3), dtype='int32')
-        if nquads:
-            quads = zeros((nquads, 4), dtype='int32')
+        tris = np.empty((ntris, 3), dtype='int32')
+        quads = np.empty((nquads, 4), dtype='int32')
 
+        # each gather is a single (nelements, nfaces, nnodes) block, so the
+        # faces of an element are consecutive
         ntri_start = 0
         nquad_start = 0
-        if ntets:
-            faces1 = self.tets[:, [0, 1, 2]]
-            faces2 = self.tets[:, [0, 1, 3]]
-            faces3 = self.tets[:, [1, 2, 3]]
-            faces4 = self.tets[:, [0, 2, 3]]
-            tris[:ntets] = faces1
-            tris[ntets:2*ntets] = faces2
-            tris[2*ntets:3*ntets] = faces3
-            tris[3*ntets:4*ntets] = faces4
-            ntri_start += 4*ntets
+        ntri_start = _fill_skin_faces(self.tets, _TET_FACES, tris, ntri_start)
+        nquad_start = _fill_skin_faces(self.hexas, _HEXA_FACES, quads, nquad_start)
+        ntri_start = _fill_skin_faces(self.penta5s, _PENTA5_TRI_FACES, tris, ntri_start)
+        nquad_start = _fill_skin_faces(self.penta5s, _PENTA5_QUAD_FACES, quads, nquad_start)
+        ntri_start = _fill_skin_faces(self.penta6s, _PENTA6_TRI_FACES, tris, ntri_start)
+        nquad_start = _fill_skin_faces(self.penta6s, _PENTA6_QUAD_FACES, quads, nquad_start)
+        assert ntri_start == ntris, 'ntri_start=%s ntris=%s' % (ntri_start, ntris)
+        assert nquad_start == nquads, 'nquad_start=%s nquads=%s' % (nquad_start, nquads)
+
+        # two neighboring solids share a face, so the faces on the
+        # surface are the ones that are only used once
+        tris = _get_boundary_faces(tris)
+        quads = _get_boundary_faces(quads)
+        return tris, quads
+
+
+def _fill_skin_faces(elements, face_templates, faces, iface):
+    """fills the faces of one element type and returns the next face"""
+    nelements = len(elements)
+    if nelements == 0:
+        return iface
+    nfaces_per_element, nnodes_per_face = face_templates.shape
+    nfaces = nelements * nfaces_per_element
+    faces[iface:iface+nfaces, :] = elements[:, face_templates].reshape(nfaces, nnodes_per_face)
+    return iface + nfaces
+
+
+def _get_boundary_faces(faces):
+    """
+    Finds the faces that are only used by a single element
 
-        if nhexas:
-            # btm (1-2-3-4)
-            # top (5-6-7-8)
-            # left (1-4-8-5
-            # right (2-3-7-6)
-            # front (1-2-6-5)
-            # back (4-3-7-8)
-            faces1 = self.hexas[:, [0, 1, 2, 3]] # 1,2,3,4
-            faces2 = self.hexas[:, [4, 5, 6, 7]] # 5,6,7,8
-            faces3 = self.hexas[:, [0, 3, 7, 4]]
-            faces4 = self.hexas[:, [1, 2, 6, 5]]
-            faces5 = self.hexas[:, [0, 1, 5, 4]]
-            faces6 = self.hexas[:, [3, 2, 6, 7]]
-            quads[: nhexas] = faces1
-            quads[nhexas:2*nhexas] = faces2
-            quads[2*nhexas:3*nhexas] = faces3
-            quads[3*nhexas:4*nhexas] = faces4
-            quads[4*nhexas:5*nhexas] = faces5
-            quads[5*nhexas:6*nhexas] = faces6
-            nquad_start += 6*nhexas
-
-        if npenta5s:
-            faces1 = self.penta5s[:, [0, 1, 2, 3]] # 1,2,3,4
-            quads[nquad_start:nquad_start+npenta5s] = faces1
-
-            faces2 = self.penta5s[:, [0, 1, 4]]
-            faces3 = self.penta5s[:, [1, 2, 4]]
-            faces4 = self.penta5s[:, [2, 3, 4]]
-            faces5 = self.penta5s[:, [3, 0, 4]]
-            tris[ntri_start           :ntri_start+  npenta5s] = faces2
-            tris[ntri_start+  npenta5s:ntri_start+2*npenta5s] = faces3
-            tris[ntri_start+2*npenta5s:ntri_start+3*npenta5s] = faces4
-            tris[ntri_start+3*npenta5s:ntri_start+4*npenta5s] = faces5
-            ntri_start += 4*npenta5s
-
-        if npenta6s:
-            faces1 = self.penta5s[:, [0, 1, 2]]
-            faces2 = self.penta5s[:, [3, 4, 5]]
-            quads[nquad_start         :nquad_start+  npenta5s] = faces1
-            quads[nquad_start+npenta5s:nquad_start+2*npenta5s] = faces2
-
-            faces3 = self.penta5s[:, [1, 4, 5, 3]]
-            faces4 = self.penta5s[:, [0, 1, 4, 3]]
-            faces5 = self.penta5s[:, [5, 3, 0, 2]]
-            tris[ntri_start           :ntri_start+  npenta6s] = faces3
-            tris[ntri_start+  npenta6s:ntri_start+2*npenta6s] = faces4
-            tris[ntri_start+2*npenta6s:ntri_start+3*npenta6s] = faces5
-        #from numpy.lib.arraysetops import unique
-        #from numpy import lexsort
-
-        #-----------------------------------------
-        # we have two merged triangle faces of two neighboring TETRAs
-        # and we need to merge them
-        #
-        # this could likely be much, much more efficient
-
-        tri_array = np.array(tris)
-        quad_array = np.array(quads)
-        if 0:
-            if ntris:
-                #print(tris)
-                #tris = tris.sort()
-                #print(tris)
-                tri_set = set()
-                #tris = tris.sort()
-                for tri in tris:
-                    tri_set.add(tuple(tri))
-                tri_array = array(list(tri_set))
-            else:
-                tri_array = np.array([])
+    Parameters
+    ----------
+    faces : (nfaces, nnodes) int ndarray
+        the faces of all the solid elements
 
-            if nquads:
-                quads.sort()
-                unused_quad_set = set()
-                # if tris:
-                    # tris = vstack(tris)
-                    # tris.sort(axis=0)
-                    # tris = unique_rows(tris)
-                # if quads:
-                    # quads = vstack(quads)
-                    # quads.sort(axis=0)
-                    # quads = unique_rows(tris)
-                raise NotImplementedError()
-            else:
-                quad_array = np.array(quads)
+    Returns
+    -------
+    boundary_faces : (nboundary_faces, nnodes) int ndarray
+        the unique faces in their original node order
+    """
+    if len(faces) == 0:
+        return faces
+    # the node order of the shared faces differs, so sort the
+    # node ids to get a key for each face
+    sorted_faces = np.sort(faces, axis=1)
+    unused_ufaces, iface, counts = np.unique(
+        sorted_faces, axis=0, return_index=True, return_counts=True)
+    iboundary = np.sort(iface[counts == 1])
+    return faces[iboundary, :]
+
+
+def _write_grids(bdf_file, nids, nodes, size=16, is_double=False):
+    """writes the GRID cards in a single block"""
+    format_grid = _get_grid_formatter(size, is_double)
+    # one C-level conversion instead of boxing every row/value from numpy
+    nids = np.asarray(nids).tolist()
+    nodes = np.asarray(nodes).tolist()
+    bdf_file.write(''.join([format_grid(nid, node) for nid, node in zip(nids, nodes)]))
+
+
+def _get_grid_formatter(size, is_double):
+    """
+    Builds a GRID formatter with the card size and field precision
+    already chosen, so there are no per-node branches or lookups
 
-        #print(tris)
-        #print(quads)
-        return tris, quad_array
+    Parameters
+    ----------
+    size : int; {8, 16}
+        the bdf write precision
+    is_double : bool
+        the field precision to write (size=16 only)
+
+    Returns
+    -------
+    format_grid : func(nid, xyz) -> str
+        formats a single GRID
+    """
+    if size == 8:
+        print_float = print_float_8
+        fmt = 'GRID    %8i%8s%s%s%s\n'
+    else:
+        print_float = print_scientific_double if is_double else print_float_16
+        fmt = ('GRID*   %16i%16s%16s%16s\n'
+               '*       %16s\n')
+
+    def format_grid(nid, xyz):
+        return fmt % (nid, '', print_float(xyz[0]), print_float(xyz[1]), print_float(xyz[2]))
+    return format_grid
+
+
+def _write_elements(bdf_file, card_name, eid, pids, elements):
+    """
+    Writes a block of elements of a single type in small field format
+
+    Parameters
+    ----------
+    bdf_file : file
+        the open text file
+    card_name : str
+        the card (e.g., 'CTRIA3'); the fields are eid, pid, and the nodes
+    eid : int
+        the first element id
+    pids : int / (nelements, ) int ndarray
+        the property id(s)
+    elements : (nelements, nnodes) int ndarray
+        the node ids
+
+    Returns
+    -------
+    eid : int
+        the next element id
+    """
+    nelements = len(elements)
+    if nelements == 0:
+        return eid
+    eids = arange(eid, eid + nelements)
+    pids = np.broadcast_to(pids, (nelements, ))
+
+    nfields = elements.shape[1] + 2
+    nfields1 = min(nfields, 8)
+    # the kernel only writes non-negative ids that fit in 8 characters
+    is_small_field = (
+        eids[-1] < 10 ** 8 and
+        elements.min() >= 0 and elements.max() < 10 ** 8 and
+        pids.min() >= 0 and pids.max() < 10 ** 8)
+    if IS_NUMBA and is_small_field:
+        nbytes_per_line = 8 + 8 * nfields1 + 1
+        if nfields > 8:
+            nbytes_per_line += 8 + 8 * (nfields - nfields1) + 1
+        card_name_bytes = np.frombuffer(card_name.ljust(8).encode('ascii'), dtype='uint8')
+        out = np.empty(nelements * nbytes_per_line, dtype='uint8')
+        _format_elements_8_kernel(
+            card_name_bytes, eids.astype('int64'), pids.astype('int64'),
+            np.ascontiguousarray(elements, dtype='int64'), out, nbytes_per_line)
+        bdf_file.write(out.tobytes().decode('ascii'))
+        return eid + nelements
+
+    fmt = card_name.ljust(8) + '%-8i' * nfields1
+    if nfields > 8:
+        fmt += '\n        ' + '%-8i' * (nfields - nfields1)
+    data = np.column_stack([eids, pids, elements])
+    np.savetxt(bdf_file, data, fmt=fmt)
+    return eid + nelements
+
+
+def _get_missing_values(values, sorted_values):
+    """finds the values that aren't in the sorted array"""
+    nsorted = len(sorted_values)
+    if nsorted == 0:
+        return values
+    index = np.searchsorted(sorted_values, values)
+    is_missing = (index == nsorted) | (sorted_values[np.minimum(index, nsorted - 1)] != values)
+    return values[is_missing]
+
+
+def _is_repeated_node(elements):
+    """flags the elements that reference the same node more than once"""
+    is_repeated = zeros(elements.shape[0], dtype='bool')
+    if IS_NUMBA:
+        _is_repeated_node_kernel(np.ascontiguousarray(elements), is_repeated)
+        return is_repeated
+
+    nnodes = elements.shape[1]
+    for i in range(nnodes - 1):
+        for j in range(i + 1, nnodes):
+            is_repeated |= elements[:, i] == elements[:, j]
+    return is_repeated
+
+
+def _check_unique_nodes(elements, card_name):
+    """verifies that no element references the same node twice"""
+    is_repeated = _is_repeated_node(elements)
+    if is_repeated.any():
+        raise AssertionError('%s has repeated nodes; elements=%s' % (
+            card_name, elements[is_repeated]))
+
+
+def _read_block(data, offset, dtype, ndarray_dtype, nrows, ncols):
+    """
+    Gets a block of the ugrid from the file buffer
+
+    Parameters
+    ----------
+    data : bytearray
+        the data after the header
+    offset : int
+        the byte offset of the block in data
+    dtype : str
+        the on-disk type (e.g., '>i', '<f')
+    ndarray_dtype : str
+        the native type of the output array (e.g., 'int32', 'float32')
+    nrows / ncols : int / int or None
+        the shape of the block; ncols=None reads a vector
+
+    Returns
+    -------
+    array : (nrows, ncols) or (nrows, ) ndarray
+        the data in native byte order
+    offset : int
+        the byte offset of the next block
+    """
+    nvalues = nrows if ncols is None else nrows * ncols
+    array_data = np.frombuffer(data, dtype=dtype, count=nvalues, offset=offset)
+    offset += array_data.nbytes
+    # no-op if the file is native endian
+    array_data = array_data.astype(ndarray_dtype, copy=False)
+    if ncols is not None:
+        array_data = array_data.reshape((nrows, ncols))
+    return array_data, offset
 
 
 def determine_dytpe_nfloat_endian_from_ugrid_filename(ugrid_filename=None):
@@ -777,27 +880,10 @@ def determine_dytpe_nfloat_endian_from_ugrid_filename(ugrid_filename=None):
         raise ValueError(msg)
     assert ext == 'ugrid', 'extension=%r' % ext
 
-    if '8' in file_format:
-        ndarray_float = 'float64'
-        float_fmt = 'd'
-        nfloat = 8
-    elif '4' in file_format:
-        ndarray_float = 'float32'
-        float_fmt = 'f'
-        nfloat = 4
-    else:  # ???
-        msg = 'file_format=%r ugrid_filename=%s' % (file_format, ugrid_filename)
-        raise NotImplementedError(msg)
-
-    if 'lb' in file_format:  # C binary, little endian
-        endian = '<'
-    elif 'b' in file_format: # C binary, big endian
-        endian = '>'
-    #elif 'lr' in file_format: # Fortran unformatted binary, little endian
-        #endian = '>'
-    #elif 'r' in file_format:  # Fortran unformatted binary, big endian
-        #endian = '>'
-    else:  # fortran unformatted
+    try:
+        ndarray_float, float_fmt, nfloat, endian = _FILE_FORMATS[file_format]
+    except KeyError:
+        # lr8/r8 (Fortran unformatted binary) aren't supported
         msg = 'file_format=%r ugrid_filename=%s' % (file_format, ugrid_filename)
         raise NotImplementedError(msg)
     return ndarray_float, float_fmt, nfloat, endian, ugrid_filename
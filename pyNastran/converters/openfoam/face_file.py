@@ -3,10 +3,14 @@ defines:
  - model = FaceFile(log=None, debug=False)
 
 """
-from copy import deepcopy
 import numpy as np
 from cpylog import get_logger2
 
+# (a b c) to ' a b c '
+PARENTHESIS_TO_SPACE_BYTES = bytes.maketrans(b'()', b'  ')
+NEWLINE = ord('\n')
+ZERO = ord('0')
+
 
 class FaceFile:
     def __init__(self, log=None, debug=False):
@@ -16,8 +20,9 @@ class FaceFile:
         #p = FoamFile(face_filename)
         #lines = p.read_foam_file()
         #print('converting')
-        with open(face_filename, 'r') as face_file:
-            self._read_face_file(face_file, ifaces_to_read=ifaces_to_read)
+        with open(face_filename, 'rb') as face_file:
+            faces = self._read_face_file(face_file, ifaces_to_read=ifaces_to_read)
+        return faces
 
     def _read_face_file(self, face_file, ifaces_to_read=None):
         i = 0
@@ -48,79 +53,53 @@ class FaceFile:
     def _read_all_faces(self, face_file, nfaces):
         """reads all the faces"""
         self.log.info('nfaces = %s' % nfaces)
-        faces = np.ones((nfaces, 4), dtype='int32') * -1
+        # 3(a b c) to [3, a, b, c]
+        # 4(a b c d) to [4, a, b, c, d]
+        data = face_file.read()
+        iend = data.find(b'\n)')
+        if iend != -1:
+            data = data[:iend]
 
-        i = 0
-        for j in range(nfaces):
-            # 3(a b c) to [a, b, c]
-            # 4(a b c d) to [a, b, c, d]
-            face_line = face_file.readline()
-            i += 1
-            sline = face_line[1:].strip('( )\n\r').split()
-            #self.log.info(str(sline))
-            try:
-                if len(sline) == 3:
-                    faces[j, :3] = sline[:3]
-                elif len(sline) == 4:
-                    faces[j, :] = sline[:4]  # TODO: quads only
-                else:
-                    msg = 'The sline is the wrong length (3/4 required)\n'
-                    msg += 'sline = %s\n' % str(sline)
-                    msg += 'line = %r\n' % face_line.rstrip()
-                    raise RuntimeError(msg)
-            except:
-                print('face = %r' % face_line)
-                print(sline, i, len(sline))
-                raise
+        # there is one face per line and the first character is the
+        # number of nodes, so the face offsets don't need a parse
+        buffer = np.frombuffer(data, dtype='uint8')
+        iline = np.zeros(nfaces, dtype='int64')
+        iline[1:] = np.where(buffer == NEWLINE)[0][:nfaces-1] + 1
+        nnodes = buffer[iline].astype('int32') - ZERO
+        if nnodes.min() < 3 or nnodes.max() > 4:
+            iface = np.where((nnodes < 3) | (nnodes > 4))[0][0]
+            msg = 'The face is the wrong length (3/4 required)\n'
+            msg += 'iface=%s nnodes=%s\n' % (iface, nnodes[iface])
+            raise RuntimeError(msg)
+
+        # the node ids follow the count (istart is the count's index)
+        ntokens = nnodes + 1
+        ntokens_total = ntokens.sum()
+        # the list was cut at its closing ")", so no count is passed
+        # (a short read with count is padded with garbage)
+        ids = np.fromstring(data.translate(PARENTHESIS_TO_SPACE_BYTES),
+                            dtype='int32', sep=' ')
+        if len(ids) < ntokens_total:
+            msg = 'nfaces=%s, so %s values are required; found %s' % (
+                nfaces, ntokens_total, len(ids))
+            raise RuntimeError(msg)
+        istart = np.cumsum(ntokens) - ntokens + 1
+
+        faces = np.full((nfaces, 4), -1, dtype='int32')
+        faces[:, :3] = ids[istart[:, np.newaxis] + np.arange(3)]
+        iquad = np.where(nnodes == 4)[0]
+        faces[iquad, 3] = ids[istart[iquad] + 3]
         return faces
 
     def _read_subset_faces(self, face_file, nfaces, ifaces_to_read):
         """
-        we need to sort our faces as we read the faces sequentially
-        however the output needs to be in unsorted order so we save the sorting
-        order and back apply it at the end
+        reads all the faces and then keeps the requested faces in the
+        order of ifaces_to_read
         """
         if isinstance(ifaces_to_read, list):
             ifaces_to_read = np.array(ifaces_to_read)
 
-        isort = np.argsort(ifaces_to_read)
-        self.log.info('isort = %s' % isort)
-        ifaces_to_read_sorted = ifaces_to_read[isort]
-
-        nfaces2 = len(ifaces_to_read)  # must be sorted
-        assert len(isort) == nfaces2
-        faces = np.ones((nfaces2, 4), dtype='int32') * -1
-        ni = 0
-        i = 0
-        for j in range(nfaces):
-            face_line = face_file.readline()
-            i += 1
-            try:
-                ni_face = ifaces_to_read_sorted[ni]
-            except:
-                raise
-            #if j % 5000 == 0 or j == ni_face:
-                #print('j=%s ni=%s' % (j, ni))
-            if j == ni_face:
-                # 3(a b c) to [a, b, c]
-                # 4(a b c d) to [a, b, c, d]
-                sline = face_line[1:].strip('( )\n\r').split()
-                try:
-                    if len(sline) == 3:
-                        faces[ni, :3] = sline[:3]
-                    elif len(sline) == 4:
-                        faces[ni, :] = sline[:4]
-                    else:
-                        msg = 'The sline is the wrong length (3/4 required)\n'
-                        msg += 'sline = %s\n' % str(sline)
-                        msg += 'line = %r\n' % face_line
-                        raise RuntimeError(msg)
-                except:
-                    print('face = %r' % face_line.rstrip())
-                    print(sline, i, j, ni)
-                    raise
-                ni += 1
-        #assert faces[:, 0].min() > 0, 'where-1 = %s' % where(faces[:, 0] == -1)[0]
+        faces = self._read_all_faces(face_file, nfaces)
+        faces = faces[ifaces_to_read, :]
         self.log.info(faces)
-        faces[isort, :] = deepcopy(faces[:, :])
         return faces
@@ -10,7 +10,6 @@ import numpy as np
 from numpy import zeros, arange, where, unique, cross
 from numpy.linalg import norm  # type: ignore
 
-import vtk
 #VTK_TRIANGLE = 5
 from vtk import vtkTriangle, vtkQuad, vtkHexahedron
 
@@ -19,7 +18,126 @@ from pyNastran.converters.openfoam.boundary_file import Boundary
 from pyNastran.gui.gui_objects.gui_result import GuiResult
 from pyNastran.utils import check_path
 from pyNastran.gui.utils.vtk.vtk_utils import (
-    create_vtk_cells_of_constant_element_type, numpy_to_vtk_points)
+    create_vtk_cells_of_constant_element_type,
+    create_vtk_cells_of_mixed_element_types, numpy_to_vtk_points)
+try:
+    from numba import njit, prange
+    IS_NUMBA = True
+except ImportError:  # pragma: no cover
+    IS_NUMBA = False
+
+
+if IS_NUMBA:
+    # no fastmath, so a degenerate face is NaN like the numpy path
+    @njit(parallel=True, cache=True)
+    def _compute_face_normals(i0, i1, i2, i3, nodes, normals):  # pragma: no cover
+        """numba kernel for ``get_face_normals``; (p2 - p0) x (p3 - p1)"""
+        for eid in prange(i0.shape[0]):
+            n0 = i0[eid]
+            n1 = i1[eid]
+            n2 = i2[eid]
+            n3 = i3[eid]
+            ax = nodes[n2, 0] - nodes[n0, 0]
+            ay = nodes[n2, 1] - nodes[n0, 1]
+            az = nodes[n2, 2] - nodes[n0, 2]
+            bx = nodes[n3, 0] - nodes[n1, 0]
+            by = nodes[n3, 1] - nodes[n1, 1]
+            bz = nodes[n3, 2] - nodes[n1, 2]
+            nx = ay * bz - az * by
+            ny = az * bx - ax * bz
+            nz = ax * by - ay * bx
+            inv_length = 1.0 / np.sqrt(nx * nx + ny * ny + nz * nz)
+            normals[eid, 0] = nx * inv_length
+            normals[eid, 1] = ny * inv_length
+            normals[eid, 2] = nz * inv_length
+
+
+def get_face_normals(nodes, elems, itri):
+    """
+    Calculates the unit normals of a mixed tri/quad face mesh
+
+    Parameters
+    ----------
+    nodes : (nnodes, 3) float ndarray
+        the xyz locations
+    elems : (nelements, 4) int ndarray
+        the 0-based node ids; triangles are padded with -1
+    itri : (ntri, ) int ndarray
+        the indices of the triangles in elems
+
+    Returns
+    -------
+    normals : (nelements, 3) float32 ndarray
+        the unit normals
+
+    """
+    nelements = elems.shape[0]
+    normals = zeros((nelements, 3), dtype='float32')
+
+    # a quad normal is (p2 - p0) x (p3 - p1) and a tri normal is
+    # (p1 - p0) x (p2 - p0) = (p2 - p0) x (p0 - p1), so using p0 as
+    # the 4th node of a triangle lets us do all the faces in one pass
+    i0 = np.ascontiguousarray(elems[:, 0])
+    i1 = np.ascontiguousarray(elems[:, 1])
+    i2 = np.ascontiguousarray(elems[:, 2])
+    i3 = elems[:, 3].copy()
+    i3[itri] = i0[itri]
+    if IS_NUMBA:
+        _compute_face_normals(i0, i1, i2, i3, nodes, normals)
+        return normals
+
+    a = nodes[i2, :] - nodes[i0, :]
+    b = nodes[i3, :] - nodes[i1, :]
+    n = cross(a, b)
+    normals[:, :] = n / norm(n, axis=1, keepdims=True)
+    return normals
+
+
+def write_openfoam_bdf(bdf_filename, nodes, names, faces=None, itri=None, iquad=None):
+    """
+    Writes the OpenFOAM model to a BDF
+
+    Parameters
+    ----------
+    bdf_filename : str
+        the path to the BDF
+    nodes : (nnodes, 3) float ndarray
+        the xyz locations
+    names : (nelements, ) int ndarray
+        the region ids, which are used as the property ids
+    faces : (nelements, 4) int ndarray; default=None
+        the 0-based node ids of a face mesh; triangles are padded with -1
+        None : only write the properties
+    itri : (ntri, ) int ndarray; default=None
+        the indices of the triangles in faces
+    iquad : (nquad, ) int ndarray; default=None
+        the indices of the quads in faces
+
+    """
+    with open(bdf_filename, 'w') as bdf_file:
+        bdf_file.write('CEND\n')
+        bdf_file.write('BEGIN BULK\n')
+
+        unames = unique(names)
+        np.savetxt(bdf_file, unames, fmt='PSHELL,%d,1,0.1')
+        bdf_file.write('MAT1,1,1.0e7,,0.3\n')
+
+        if faces is not None:
+            nnodes = nodes.shape[0]
+            nelements = faces.shape[0]
+            # should stop plotting duplicate nodes
+            is_used = zeros(nnodes, dtype='bool')
+            is_used[faces[faces >= 0]] = True
+            nids = arange(1, nnodes + 1)
+            grid_array = np.column_stack([nids[is_used], nodes[is_used, :]])
+            np.savetxt(bdf_file, grid_array, fmt='GRID,%d,,%.8g,%.8g,%.8g')
+
+            eids = arange(1, nelements + 1)
+            tri_array = np.column_stack([eids[itri], names[itri], faces[itri, :3] + 1])
+            quad_array = np.column_stack([eids[iquad], names[iquad], faces[iquad, :] + 1])
+            np.savetxt(bdf_file, tri_array, fmt='CTRIA3,%d,%d,%d,%d,%d')
+            np.savetxt(bdf_file, quad_array, fmt='CQUAD4,%d,%d,%d,%d,%d,%d')
+        bdf_file.write('ENDDATA\n')
 
 
 class OpenFoamIO:
@@ -71,15 +189,31 @@ class OpenFoamIO:
         #return skip_reading
 
     def load_openfoam_hex_geometry(self, openfoam_filename, name='main', plot=True, **kwargs):
-        self.load_openfoam_geometry(openfoam_filename, 'hex')
+        self.load_openfoam_geometry(openfoam_filename, 'hex', name=name, plot=plot, **kwargs)
 
     def load_openfoam_shell_geometry(self, openfoam_filename, name='main', plot=True, **kwargs):
-        self.load_openfoam_geometry(openfoam_filename, 'shell')
+        self.load_openfoam_geometry(openfoam_filename, 'shell', name=name, plot=plot, **kwargs)
 
     def load_openfoam_faces_geometry(self, openfoam_filename, name='main', plot=True, **kwargs):
-        self.load_openfoam_geometry(openfoam_filename, 'faces')
-
-    def load_openfoam_geometry(self, openfoam_filename, mesh_3d, name='main', plot=True, **kwargs):
+        self.load_openfoam_geometry(openfoam_filename, 'faces', name=name, plot=plot, **kwargs)
+
+    def load_openfoam_geometry(self, openfoam_filename, mesh_3d, name='main', plot=True,
+                               write_bdf=False, bdf_filename='points.bdf', **kwargs):
+        """
+        Loads an OpenFOAM model
+
+        Parameters
+        ----------
+        openfoam_filename : str
+            the blockMeshDict (hex/shell) or boundary (faces) file
+        mesh_3d : str
+            the mesh type {hex, shell, faces}
+        write_bdf : bool; default=False
+            write the model to bdf_filename
+        bdf_filename : str; default='points.bdf'
+            the path to the BDF
+
+        """
         model_name = name
         #key = self.caseKeys[self.iCase]
         #case = self.resultCases[key]
@@ -95,39 +229,18 @@ class OpenFoamIO:
         if mesh_3d in ['hex', 'shell']:
             model = BlockMesh(log=log, debug=False) # log=self.log, debug=False
         elif mesh_3d == 'faces':
-            model = BlockMesh(log=log, debug=False) # log=self.log, debug=False
             boundary = Boundary(log=log, debug=False)
-
+        else:
+            raise RuntimeError(mesh_3d)
 
         self.gui.modelType = 'openfoam'
         #self.modelType = model.modelType
         log.info('openfoam_filename = %s' % openfoam_filename)
 
-        is_face_mesh = False
-        if mesh_3d == 'hex':
-            is_3d_blockmesh = True
-            is_surface_blockmesh = False
-            (nodes, hexas, quads, names, patches) = model.read_openfoam(openfoam_filename)
-        elif mesh_3d == 'shell':
-            is_3d_blockmesh = False
-            is_surface_blockmesh = True
-            (nodes, hexas, quads, names, patches) = model.read_openfoam(openfoam_filename)
-        elif mesh_3d == 'faces':
-            is_3d_blockmesh = False
-            is_surface_blockmesh = False
-            is_face_mesh = True
-            #(nodes, hexas, quads, names, patches) = model.read_openfoam(openfoam_filename)
-        else:
-            raise RuntimeError(mesh_3d)
-
-        tris = []
-
-
-        if mesh_3d == 'hex':
-            self.gui.nelements = len(hexas)
-        elif mesh_3d == 'shell':
-            self.gui.nelements = len(quads)
-        elif mesh_3d == 'faces':
+        is_3d_blockmesh = mesh_3d == 'hex'
+        is_surface_blockmesh = mesh_3d == 'shell'
+        is_face_mesh = mesh_3d == 'faces'
+        if is_face_mesh:
             dirname = os.path.dirname(openfoam_filename)
             point_filename = os.path.join(dirname, 'points')
             face_filename = os.path.join(dirname, 'faces')
@@ -140,30 +253,39 @@ class OpenFoamIO:
             patches = None
             nodes, quads, names = boundary.read_openfoam(
                 point_filename, face_filename, boundary_filename)
-            self.gui.nelements = len(quads) + len(tris)
+            self.gui.nelements = len(quads)
         else:
-            raise RuntimeError(mesh_3d)
+            (nodes, hexas, quads, names, patches) = model.read_openfoam(openfoam_filename)
+            self.gui.nelements = len(hexas) if is_3d_blockmesh else len(quads)
 
         self.gui.nnodes = len(nodes)
         log = self.gui.log
         log.debug("nnodes = %s" % self.gui.nnodes)
         log.debug("nelements = %s" % self.gui.nelements)
 
+        # the cells are set in one shot with SetCells, which replaces the
+        # cell arrays, so there's no need to Allocate the grid
         grid = self.gui.grid
-        grid.Allocate(self.gui.nelements, 1000)
 
         self.gui.nid_map = {}
 
         assert nodes is not None
-        nnodes = nodes.shape[0]
 
-        xmax, ymax, zmax = nodes.max(axis=0)
-        xmin, ymin, zmin = nodes.min(axis=0)
-        nodes -= np.array([xmin, ymin, zmin])
-        log.info('xmax=%s xmin=%s' % (xmax, xmin))
-        log.info('ymax=%s ymin=%s' % (ymax, ymin))
-        log.info('zmax=%s zmin=%s' % (zmax, zmin))
-        dim_max = max(xmax-xmin, ymax-ymin, zmax-zmin)
+        # shift the model to the origin; after the subtraction, the max
+        # values are the model dimensions
+        #
+        # the shift is done in float64, so large coordinate offsets
+        # (e.g., UTM) don't lose precision; the translated nodes are cast
+        # to float32 for the normals and VTK arrays
+        nodes = np.asarray(nodes, dtype='float64')
+        xyz_min = nodes.min(axis=0)
+        nodes = (nodes - xyz_min).astype('float32')
+        dxyz = nodes.max(axis=0)
+        xyz_max = xyz_min + dxyz
+        log.info('xmax=%s xmin=%s' % (xyz_max[0], xyz_min[0]))
+        log.info('ymax=%s ymin=%s' % (xyz_max[1], xyz_min[1]))
+        log.info('zmax=%s zmin=%s' % (xyz_max[2], xyz_min[2]))
+        dim_max = dxyz.max()
 
         #dim_max = (mmax - mmin).max()
         assert dim_max > 0
@@ -175,94 +297,55 @@ class OpenFoamIO:
 
         #print('is_face_mesh=%s is_3d_blockmesh=%s is_surface_blockmesh=%s' % (
             #is_face_mesh, is_3d_blockmesh, is_surface_blockmesh))
-        with open('points.bdf', 'w') as bdf_file:
-            bdf_file.write('CEND\n')
-            bdf_file.write('BEGIN BULK\n')
-
-            unames = unique(names)
-            for pid in unames:
-                bdf_file.write('PSHELL,%i,1,0.1\n' % pid)
-            bdf_file.write('MAT1,1,1.0e7,,0.3\n')
-
-            if is_face_mesh:
-                points = vtk.vtkPoints()
-                points.SetNumberOfPoints(self.gui.nnodes)
-
-                unodes = unique(quads)
-                unodes.sort()
-                # should stop plotting duplicate nodes
-                for inode, node in enumerate(nodes):
-                    if inode in unodes:
-                        bdf_file.write('GRID,%i,,%s,%s,%s\n' % (
-                            inode + 1, node[0], node[1], node[2], ))
-                    points.InsertPoint(inode, node)
-            else:
-                points = numpy_to_vtk_points(nodes)
-
-            #elements -= 1
-            normals = None
-            if is_3d_blockmesh:
-                nelements = hexas.shape[0]
-                cell_type_hexa8 = vtkHexahedron().GetCellType()
-                create_vtk_cells_of_constant_element_type(grid, hexas, cell_type_hexa8)
-
-            elif is_surface_blockmesh:
-                nelements = quads.shape[0]
-                cell_type_quad4 = vtkQuad().GetCellType()
-                create_vtk_cells_of_constant_element_type(grid, quads, cell_type_quad4)
-
-            elif is_face_mesh:
-                elems = quads
-                nelements = quads.shape[0]
-                nnames = len(names)
-                normals = zeros((nelements, 3), dtype='float32')
-                if nnames != nelements:
-                    msg = 'nnames=%s nelements=%s names.max=%s names.min=%s' % (
-                        nnames, nelements, names.max(), names.min())
-                    raise RuntimeError(msg)
-                for eid, element in enumerate(elems):
-                    ineg = where(element == -1)[0]
-
-                    nnodes = 4
-                    if ineg:
-                        nnodes = ineg.max()
-
-                    #pid = 1
-                    pid = names[eid]
-                    if nnodes == 3: # triangle!
-                        bdf_file.write('CTRIA3,%i,%i,%i,%i,%i\n' % (
-                            eid+1, pid, element[0]+1, element[1]+1, element[2]+1))
-                        elem = vtkTriangle()
-                        a = nodes[element[1], :] - nodes[element[0], :]
-                        b = nodes[element[2], :] - nodes[element[0], :]
-                        n = cross(a, b)
-                        normals[eid, :] = n / norm(n)
-
-                        elem.GetPointIds().SetId(0, element[0])
-                        elem.GetPointIds().SetId(1, element[1])
-                        elem.GetPointIds().SetId(2, element[2])
-                        grid.InsertNextCell(elem.GetCellType(), elem.GetPointIds())
-                    elif nnodes == 4:
-                        bdf_file.write('CQUAD4,%i,%i,%i,%i,%i,%i\n' % (
-                            eid+1, pid, element[0]+1, element[1]+1, element[2]+1, element[3]+1))
-                        a = nodes[element[2], :] - nodes[element[0], :]
-                        b = nodes[element[3], :] - nodes[element[1], :]
-                        n = cross(a, b)
-                        normals[eid, :] = n / norm(n)
-
-                        elem = vtkQuad()
-                        elem.GetPointIds().SetId(0, element[0])
-                        elem.GetPointIds().SetId(1, element[1])
-                        elem.GetPointIds().SetId(2, element[2])
-                        elem.GetPointIds().SetId(3, element[3])
-                        grid.InsertNextCell(elem.GetCellType(), elem.GetPointIds())
-                    else:
-                        raise RuntimeError('nnodes=%s' % nnodes)
-            else:
-                msg = 'is_surface_blockmesh=%s is_face_mesh=%s; pick one' % (
-                    is_surface_blockmesh, is_face_mesh)
+        points = numpy_to_vtk_points(nodes)
+
+        #elements -= 1
+        normals = None
+        faces = None
+        itri = None
+        iquad = None
+        if is_3d_blockmesh:
+            nelements = hexas.shape[0]
+            cell_type_hexa8 = vtkHexahedron().GetCellType()
+            create_vtk_cells_of_constant_element_type(grid, hexas, cell_type_hexa8)
+
+        elif is_surface_blockmesh:
+            nelements = quads.shape[0]
+            cell_type_quad4 = vtkQuad().GetCellType()
+            create_vtk_cells_of_constant_element_type(grid, quads, cell_type_quad4)
+
+        elif is_face_mesh:
+            faces = quads
+            nelements = quads.shape[0]
+            nnames = len(names)
+            if nnames != nelements:
+                msg = 'nnames=%s nelements=%s names.max=%s names.min=%s' % (
+                    nnames, nelements, names.max(), names.min())
                 raise RuntimeError(msg)
-            bdf_file.write('ENDDATA\n')
+            # bucket the faces by the number of nodes once, so the
+            # normals and cards are calculated per element type
+            nnodes_per_face = (faces != -1).sum(axis=1)
+            itri = where(nnodes_per_face == 3)[0]
+            iquad = where(nnodes_per_face == 4)[0]
+            if len(itri) + len(iquad) != nelements:
+                raise RuntimeError('nnodes_per_face=%s' % unique(nnodes_per_face))
+
+            normals = get_face_normals(nodes, faces, itri)
+
+            cell_type_tri3 = vtkTriangle().GetCellType()
+            cell_type_quad4 = vtkQuad().GetCellType()
+            cell_types = np.full(nelements, cell_type_quad4, dtype='int8')
+            cell_types[itri] = cell_type_tri3
+            create_vtk_cells_of_mixed_element_types(
+                grid, faces, nnodes_per_face, cell_types)
+        else:
+            msg = 'is_surface_blockmesh=%s is_face_mesh=%s; pick one' % (
+                is_surface_blockmesh, is_face_mesh)
+            raise RuntimeError(msg)
+
+        if write_bdf:
+            write_openfoam_bdf(bdf_filename, nodes, names,
+                               faces=faces, itri=itri, iquad=iquad)
 
         self.gui.nelements = nelements
         grid.SetPoints(points)
@@ -276,24 +359,11 @@ class OpenFoamIO:
         ID = 1
 
         #print("nElements = ",nElements)
-        if mesh_3d == 'hex':
-            form, cases, node_ids, element_ids = self._fill_openfoam_case(
-                cases, ID, nodes, nelements,
-                patches, names, normals, is_surface_blockmesh)
-
-        elif mesh_3d == 'shell':
-            form, cases, node_ids, element_ids = self._fill_openfoam_case(
-                cases, ID, nodes, nelements,
-                patches, names, normals, is_surface_blockmesh)
-
-        elif mesh_3d == 'faces':
-            if len(names) == nelements:
-                is_surface_blockmesh = True
-            form, cases, node_ids, element_ids = self._fill_openfoam_case(
-                cases, ID, nodes, nelements, patches,
-                names, normals, is_surface_blockmesh)
-        else:
-            raise RuntimeError(mesh_3d)
+        if is_face_mesh and len(names) == nelements:
+            is_surface_blockmesh = True
+        form, cases, node_ids, element_ids = self._fill_openfoam_case(
+            cases, ID, nodes, nelements, patches,
+            names, normals, is_surface_blockmesh)
 
         self.gui.node_ids = node_ids
         self.gui.element_ids = element_ids
@@ -322,8 +392,8 @@ class OpenFoamIO:
             ('NodeID', 1, []),
         ]
 
-        eids = arange(nelements) + 1
-        nids = arange(0, nnodes)
+        eids = arange(1, nelements + 1, dtype='int32')
+        nids = arange(0, nnodes, dtype='int32')
         eid_res = GuiResult(0, header='ElementID', title='ElementID',
                             location='centroid', scalar=eids)
         nid_res = GuiResult(0, header='NodeID', title='NodeID',
@@ -336,6 +406,7 @@ class OpenFoamIO:
 
         if is_surface_blockmesh:
             if patches is not None:
+                patches = np.ascontiguousarray(patches, dtype='int32')
                 patch_res = GuiResult(0, header='Patch', title='Patch',
                                       location='centroid', scalar=patches)
                 cases[icase] = (patch_res, (0, 'Patch'))
@@ -344,6 +415,7 @@ class OpenFoamIO:
                 icase += 1
 
             if names is not None:
+                names = np.ascontiguousarray(names, dtype='int32')
                 name_res = GuiResult(0, header='Name', title='Name',
                                      location='centroid', scalar=names)
                 cases[icase] = (name_res, (0, 'Name'))
@@ -354,15 +426,19 @@ class OpenFoamIO:
                 raise RuntimeError('names is None...')
 
         if normals is not None:
+            # the normal columns are strided, so they're copied once as a
+            # (3, nelements) block; each row is a contiguous view of it and
+            # the strided normals may be freed
+            nx, ny, nz = np.ascontiguousarray(normals.T)
             nx_res = GuiResult(0, header='NormalX', title='NormalX',
                                location='node', data_format='%.1f',
-                               scalar=normals[:, 0])
+                               scalar=nx)
             ny_res = GuiResult(0, header='NormalY', title='NormalY',
                                location='node', data_format='%.1f',
-                               scalar=normals[:, 1])
+                               scalar=ny)
             nz_res = GuiResult(0, header='NormalZ', title='NormalZ',
                                location='node', data_format='%.1f',
-                               scalar=normals[:, 2])
+                               scalar=nz)
             geometry_form.append(('NormalX', icase, []))
             geometry_form.append(('NormalY', icase, []))
             geometry_form.append(('NormalZ', icase, []))
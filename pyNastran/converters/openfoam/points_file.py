@@ -7,6 +7,9 @@ import numpy as np
 
 from cpylog import get_logger2
 
+# (a b c) to ' a b c '
+PARENTHESIS_TO_SPACE = str.maketrans('()', '  ')
+
 
 def read_points_file(point_filename, ipoints_to_read=None,
                     log=None, debug=False):
@@ -44,54 +47,33 @@ class PointFile:
 
             self.log.debug('building points')
             assert npoints > 0, npoints
+            points = self._read_points(points_file, npoints)
             if ipoints_to_read is not None:
                 #print('ipoints =', ipoints_to_read)
                 ipoints_to_read.sort()
-                npoints_to_read = len(ipoints_to_read)
-                points = np.zeros((npoints_to_read, 3), dtype='float32')
-
-                self.log.info('npoints_to_read = %s' % npoints_to_read)
-                j = -1
-                ni = 0
-
-                for ipoint in ipoints_to_read:
-                    # get the next point id
-                    point = points_file.readline()
-                    sline = point.strip('( )\n\r').split()
-                    i += 1
-                    j += 1
-                    #print(f'j={j} ni={ni} ipoint={ipoint}')
-
-                    while j < ipoint:
-                        #print('skipping %s' % sline)
-                        point = points_file.readline()
-                        sline = point.strip('( )\n\r').split()
-                        assert len(sline) == 3, f'iline={i} sline={sline}'
-                        i += 1
-                        j += 1
-                    #print(point)
-
-                    sline = point.strip('( )\n\r').split()
-                    #print('sline =', sline)
-                    try:
-                        points[ni, :] = sline
-                    except:
-                        print('point = %r' % point)
-                        print(sline, i, j, ni)
-                        raise
-                    ni += 1
-            else:
-                points = np.zeros((npoints, 3), dtype='float32')
-                for j in range(npoints):
-                    point = points_file.readline()
-                    i += 1
-                    sline = point.strip('( )\n\r').split()
-                    #print(j, sline)
-                    try:
-                        points[j, :] = sline
-                    except:
-                        print('point = %r' % point)
-                        print(sline, i)
-                        raise
+                self.log.info('npoints_to_read = %s' % len(ipoints_to_read))
+                points = points[ipoints_to_read, :]
         self.log.info('points.shape = %s' % str(points.shape))
         return points
+
+    def _read_points(self, points_file, npoints):
+        """
+        reads the (x y z) block in a single pass instead of parsing
+        the file line by line
+        """
+        # each point is on a "(x y z)" line, so the list ends at the first
+        # line that starts with ")"; parsing stops there, so the footer
+        # isn't read and a short file can't be padded by fromstring
+        text = points_file.read()
+        iend = text.find('\n)')
+        if iend != -1:
+            text = text[:iend]
+        data = np.fromstring(text.translate(PARENTHESIS_TO_SPACE),
+                             dtype='float32', sep=' ')
+        nvalues = npoints * 3
+        if len(data) < nvalues:
+            msg = 'npoints=%s, so %s values are required; found %s' % (
+                npoints, nvalues, len(data))
+            raise RuntimeError(msg)
+        points = data[:nvalues].reshape(npoints, 3)
+        return points
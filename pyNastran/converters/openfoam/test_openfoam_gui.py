@@ -1,12 +1,16 @@
 import os
+import tempfile
 import unittest
+import numpy as np
 from cpylog import get_logger
 
 import pyNastran
 from pyNastran.gui.testing_methods import FakeGUIMethods
 from pyNastran.converters.openfoam.block_mesh import read_block_mesh, mirror_block_mesh
 from pyNastran.converters.openfoam.face_file import FaceFile
-from pyNastran.converters.openfoam.openfoam_io import OpenFoamIO
+from pyNastran.converters.openfoam.points_file import read_points_file
+from pyNastran.converters.openfoam import openfoam_io
+from pyNastran.converters.openfoam.openfoam_io import OpenFoamIO, get_face_normals
 from pyNastran.utils import check_path
 
 PKG_PATH = pyNastran.__path__[0]
@@ -30,9 +34,20 @@ class TestOpenFoamGUI(unittest.TestCase):
         check_path(geometry_filename, 'geometry_filename')
         test = OpenFoamGUI()
         test.log = log
-        test.on_load_geometry(geometry_filename, geometry_format='openfoam_shell', raise_error=True)
-        test.on_load_geometry(geometry_filename, geometry_format='openfoam_hex', raise_error=True)
-        os.remove('points.bdf')
+
+        # the default bdf_filename is relative, so load from an empty
+        # directory to check that nothing is written
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as dirname:
+            os.chdir(dirname)
+            try:
+                test.on_load_geometry(geometry_filename, geometry_format='openfoam_shell',
+                                      raise_error=True)
+                test.on_load_geometry(geometry_filename, geometry_format='openfoam_hex',
+                                      raise_error=True)
+                assert os.listdir(dirname) == [], os.listdir(dirname)
+            finally:
+                os.chdir(cwd)
         #test.load_openfoam_geometry_faces(geometry_filename)
 
         model = read_block_mesh(geometry_filename, log=log)
@@ -64,13 +79,134 @@ class TestOpenFoamGUI(unittest.TestCase):
         #test.log = log
         #test.load_openfoam_faces_geometry(face_filename)
         faces = FaceFile(log=log, debug=False)
-        faces.read_face_file(face_filename)
+        faces_array = faces.read_face_file(face_filename)
+        assert faces_array.tolist() == [[1, 2, 3, -1], [1, 3, 4, -1]], faces_array
 
-        faces.read_face_file(face_filename, ifaces_to_read=[1])
+        faces_array = faces.read_face_file(face_filename, ifaces_to_read=[1])
+        assert faces_array.tolist() == [[1, 3, 4, -1]], faces_array
         faces.read_face_file(face_filename, ifaces_to_read=[0, 1])
+
+        # a face list that's shorter than the header says isn't padded
+        with open(face_filename, 'w') as face_file:
+            face_file.write('2\n')
+            face_file.write('(\n')
+            face_file.write('3(1 2 3)\n')
+            face_file.write('3(1 3)\n')
+            face_file.write(')\n')
+        with self.assertRaises(RuntimeError):
+            faces.read_face_file(face_filename)
+
+        with open(point_filename, 'w') as point_file:
+            point_file.write('2\n')
+            point_file.write('(\n')
+            point_file.write('(0. 0. 0.)\n')
+            point_file.write('(1. 0.)\n')
+            point_file.write(')\n')
+        with self.assertRaises(RuntimeError):
+            read_points_file(point_filename, log=log)
         os.remove(point_filename)
         os.remove(face_filename)
 
+    def test_openfoam_faces_geometry(self):
+        """tests a mixed tri/quad face mesh"""
+        dirname = 'openfoam_faces'
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        point_filename = os.path.join(dirname, 'points')
+        face_filename = os.path.join(dirname, 'faces')
+        boundary_filename = os.path.join(dirname, 'boundary')
+        with open(point_filename, 'w') as point_file:
+            point_file.write('5\n')
+            point_file.write('(\n')
+            point_file.write('(0. 0. 0.)\n')
+            point_file.write('(1. 0. 0.)\n')
+            point_file.write('(1. 1. 0.)\n')
+            point_file.write('(0. 1. 0.)\n')
+            point_file.write('(2. 0. 1.)\n')
+            point_file.write(')\n')
+
+        with open(face_filename, 'w') as face_file:
+            face_file.write('2\n')
+            face_file.write('(\n')
+            face_file.write('4(0 1 2 3)\n')
+            face_file.write('3(1 4 2)\n')
+            face_file.write(')\n')
+
+        with open(boundary_filename, 'w') as boundary_file:
+            boundary_file.write('2\n')
+            boundary_file.write('(\n')
+            boundary_file.write('bottom\n')
+            boundary_file.write('{\n')
+            boundary_file.write('    type patch;\n')
+            boundary_file.write('    nFaces 1;\n')
+            boundary_file.write('    startFace 0;\n')
+            boundary_file.write('}\n')
+            boundary_file.write('side\n')
+            boundary_file.write('{\n')
+            boundary_file.write('    type wall;\n')
+            boundary_file.write('    nFaces 1;\n')
+            boundary_file.write('    startFace 1;\n')
+            boundary_file.write('}\n')
+            boundary_file.write(')\n')
+
+        log = get_logger(level='warning', encoding='utf-8')
+        test = OpenFoamGUI()
+        test.log = log
+        bdf_filename = os.path.join(dirname, 'faces.bdf')
+        test.model.load_openfoam_faces_geometry(
+            boundary_filename, write_bdf=True, bdf_filename=bdf_filename)
+        assert test.grid.GetNumberOfCells() == 2
+        assert test.grid.GetNumberOfPoints() == 5
+        quad = test.grid.GetCell(0)
+        tri = test.grid.GetCell(1)
+        assert quad.GetCellType() == 9, quad.GetCellType()
+        assert tri.GetCellType() == 5, tri.GetCellType()
+        assert [quad.GetPointId(i) for i in range(4)] == [0, 1, 2, 3]
+        assert [tri.GetPointId(i) for i in range(3)] == [1, 4, 2]
+
+        normal_x = test.result_cases[3][0].scalar
+        normal_z = test.result_cases[5][0].scalar
+        assert np.allclose(normal_x, [0., -1. / np.sqrt(2.)]), normal_x
+        assert np.allclose(normal_z, [1., 1. / np.sqrt(2.)]), normal_z
+
+        with open(bdf_filename, 'r') as bdf_file:
+            lines = bdf_file.readlines()
+        assert 'PSHELL,2,1,0.1\n' in lines, lines
+        assert 'CQUAD4,1,1,1,2,3,4\n' in lines, lines
+        assert 'CTRIA3,2,2,2,5,3\n' in lines, lines
+        assert 'GRID,5,,2,0,1\n' in lines, lines
+        os.remove(bdf_filename)
+        os.remove(point_filename)
+        os.remove(face_filename)
+        os.remove(boundary_filename)
+        os.rmdir(dirname)
+
+    def test_openfoam_degenerate_face_normals(self):
+        """a collapsed face is NaN with and without numba"""
+        nodes = np.array([
+            [0., 0., 0.],
+            [1., 0., 0.],
+            [1., 1., 0.],
+            [0., 1., 0.],
+        ], dtype='float32')
+        elems = np.array([
+            [0, 1, 2, 3],
+            [1, 2, 2, -1],
+            [0, 1, 2, -1],
+        ], dtype='int32')
+        itri = np.array([1, 2])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normals = get_face_normals(nodes, elems, itri)
+            is_numba = openfoam_io.IS_NUMBA
+            openfoam_io.IS_NUMBA = False
+            try:
+                normals_numpy = get_face_normals(nodes, elems, itri)
+            finally:
+                openfoam_io.IS_NUMBA = is_numba
+        assert np.allclose(normals[[0, 2], :], [[0., 0., 1.], [0., 0., 1.]]), normals
+        assert np.isnan(normals[1, :]).all(), normals
+        np.testing.assert_array_equal(normals, normals_numpy)
+
 if __name__ == '__main__':  # pragma: no cover
     unittest.main()
 
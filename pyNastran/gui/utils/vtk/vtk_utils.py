@@ -1,6 +1,7 @@
 """
 defines:
  - create_vtk_cells_of_constant_element_type(grid, elements, etype)
+ - create_vtk_cells_of_mixed_element_types(grid, elements, nnodes_per_element, etypes)
 
 """
 import warnings
@@ -289,6 +290,58 @@ def create_vtk_cells_of_constant_element_types(grid: vtk.vtkUnstructuredGrid,
 
     grid.SetCells(vtk_cell_types, vtk_cell_offsets, vtk_cells)
 
+def create_vtk_cells_of_mixed_element_types(grid: vtk.vtkUnstructuredGrid,
+                                            elements: np.ndarray,
+                                            nnodes_per_element: np.ndarray,
+                                            etypes: np.ndarray) -> None:
+    """
+    Adds elements of different types in a single call, while preserving
+    the element order (unlike ``create_vtk_cells_of_constant_element_types``).
+
+    Parameters
+    ----------
+    grid : vtk.vtkUnstructuredGrid()
+        the unstructured grid
+    elements : (nelements, nnodes_max) int ndarray
+        the elements to add; elements with fewer nodes are padded
+        at the end of the row (e.g., with -1)
+    nnodes_per_element : (nelements, ) int ndarray
+        the number of nodes of each element
+    etypes : (nelements, ) int ndarray
+        the VTK cell type of each element
+
+    """
+    nelements, nnodes_max = elements.shape
+    assert len(nnodes_per_element) == nelements, (len(nnodes_per_element), nelements)
+    assert len(etypes) == nelements, (len(etypes), nelements)
+    dtype = get_numpy_idtype_for_vtk()
+
+    # the cell array is [nnodes0, n0, n1, n2, nnodes1, n0, n1, n2, n3, ...]
+    nnodesp1 = nnodes_per_element + 1
+    cell_offsets = np.zeros(nelements, dtype=dtype)
+    cell_offsets[1:] = np.cumsum(nnodesp1[:-1])
+
+    is_node = np.arange(nnodes_max)[np.newaxis, :] < nnodes_per_element[:, np.newaxis]
+    inode = (cell_offsets[:, np.newaxis] + 1 + np.arange(nnodes_max, dtype=dtype))[is_node]
+
+    elements_vtk = np.zeros(nnodesp1.sum(), dtype=dtype)
+    elements_vtk[cell_offsets] = nnodes_per_element
+    elements_vtk[inode] = elements[is_node]
+
+    cells_id_type = numpy_to_vtkIdTypeArray(elements_vtk, deep=1)
+    vtk_cells = vtk.vtkCellArray()
+    vtk_cells.SetCells(nelements, cells_id_type)
+
+    cell_types = np.asarray(etypes, dtype='int8')
+    vtk_cell_types = numpy_to_vtk(
+        cell_types, deep=0,
+        array_type=vtk.vtkUnsignedCharArray().GetDataType())
+
+    vtk_cell_offsets = numpy_to_vtk(cell_offsets, deep=0,
+                                    array_type=vtkConstants.VTK_ID_TYPE)
+
+    grid.SetCells(vtk_cell_types, vtk_cell_offsets, vtk_cells)
+
 def create_unstructured_point_grid(points: vtk.vtkPoints,
                                    npoints: int) -> vtk.vtkUnstructuredGrid:
     """creates a point grid"""
@@ -4,7 +4,7 @@ from setuptools import setup, find_packages
 
 import pyNastran
 from packages import (check_python_version, get_package_requirements,
-                      update_version_file, PYTHON_REQUIRES,
+                      update_version_file, PYTHON_REQUIRES, EXTRAS_REQUIRE,
                       LONG_DESCRIPTION, CLASSIFIERS)
 
 
@@ -50,6 +50,7 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=install_requires,
+    extras_require=EXTRAS_REQUIRE,
     #{'': ['license.txt']}
     #package_data={'': ['*.png']},
     #data_files=[(icon_path, icon_files2)],